@@ -0,0 +1,3 @@
+from .index import build_index
+
+__all__ = ['build_index']
@@ -0,0 +1,132 @@
+import re
+from typing import Dict, List
+
+from . import query
+
+# rough per-row byte width of a postgres column for each field type
+COLUMN_WIDTHS = {
+    'Boolean': 1,
+    'Integer': 4,
+    'Many2one': 4,
+    'Date': 4,
+    'Float': 8,
+    'Monetary': 8,
+    'Datetime': 8,
+    'Selection': 16,
+    'Reference': 32,
+    'Char': 32,
+    'Text': 128,
+    'Html': 256,
+    'Json': 128,
+    'Properties': 128,
+    'Binary': 0,  # stored as attachment by default
+}
+DEFAULT_COLUMN_WIDTH = 32
+# id, create_uid, create_date, write_uid, write_date
+MAGIC_COLUMNS_WIDTH = 4 + 4 + 8 + 4 + 8
+ALWAYS_INDEXED = ('id',)
+
+RE_SQL_UNIQUE = r'\s*unique\s*\(\s*"?(\w+)'
+
+Finding = Dict
+Audit = Dict
+
+
+def field_is_stored(field: Dict) -> bool:
+    if field['type'] in ('One2many', 'Many2many'):
+        return False
+    if 'store' in field:
+        return bool(field['store'])
+    return not (field.get('compute') or field.get('related'))
+
+
+def field_is_indexed(field: Dict) -> bool:
+    return bool(field.get('index'))
+
+
+def model_special_values(class_list, attribute) -> Dict[str, List]:
+    values: Dict[str, List] = {}
+    for c in class_list:
+        model = query.get_class_name(c)
+        if model and c.get(attribute):
+            values.setdefault(model, []).append(c[attribute])
+    return values
+
+
+def order_field_names(order: str) -> List[str]:
+    names = []
+    for part in order.split(','):
+        tokens = part.split()
+        if tokens:
+            names.append(tokens[0].strip('"'))
+    return names
+
+
+def sql_unique_leading_columns(constraints) -> List[str]:
+    columns = []
+    for constraint in constraints:
+        if len(constraint) > 1 and isinstance(constraint[1], str):
+            match = re.match(RE_SQL_UNIQUE, constraint[1], re.IGNORECASE)
+            if match:
+                columns.append(match[1])
+    return columns
+
+
+def finding(model: str, field_name: str, field: Dict, reason: str) -> Finding:
+    return {
+        'model': model,
+        'field': field_name,
+        'type': field['type'],
+        'modules': field['modules'],
+        'reason': reason,
+    }
+
+
+def audit_sort_fields(model, fields, orders, rec_names, uniques) -> List[Finding]:
+    findings = []
+    candidates = [(name, '_order') for order in orders for name in order_field_names(order)]
+    candidates += [(name, '_rec_name') for name in rec_names]
+    seen = set()
+    for name, reason in candidates:
+        if name in seen or name in ALWAYS_INDEXED or name in uniques:
+            continue
+        seen.add(name)
+        field = fields.get(name)
+        if field and field_is_stored(field) and not field_is_indexed(field):
+            findings.append(finding(model, name, field, reason))
+    return findings
+
+
+def audit_many2one(model, fields, uniques) -> List[Finding]:
+    return [
+        finding(model, name, field, 'many2one')
+        for name, field in sorted(fields.items())
+        if field['type'] == 'Many2one' and field_is_stored(field)
+        and not field_is_indexed(field) and name not in uniques
+    ]
+
+
+def model_width(fields: Dict[str, Dict]) -> Dict:
+    columns = [f for f in fields.values() if field_is_stored(f)]
+    width = MAGIC_COLUMNS_WIDTH + sum(
+        COLUMN_WIDTHS.get(f['type'], DEFAULT_COLUMN_WIDTH) for f in columns)
+    return {'columns': len(columns), 'width': width}
+
+
+def audit_models(class_list) -> Audit:
+    models = query.get_model_fields(class_list)
+    orders = model_special_values(class_list, '_order')
+    rec_names = model_special_values(class_list, '_rec_name')
+    constraints = model_special_values(class_list, '_sql_constraints')
+
+    findings = []
+    widths = {}
+    for model in sorted(models):
+        fields = models[model]
+        uniques = set(sql_unique_leading_columns(
+            [c for cs in constraints.get(model, []) for c in cs]))
+        findings += audit_sort_fields(
+            model, fields, orders.get(model, []), rec_names.get(model, []), uniques)
+        findings += audit_many2one(model, fields, uniques)
+        widths[model] = model_width(fields)
+    return {'findings': findings, 'widths': widths}
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Any, Optional
+
+from .utils import Path
+
+CACHE_VERSION = "1"
+DEFAULT_CACHE_PATH = "~/.cache/pigeoo"
+
+
+def file_digest(file_name: Path) -> str:
+    with open(file_name, 'rb') as f:
+        content = f.read()
+    return hashlib.sha1(CACHE_VERSION.encode() + content).hexdigest()
+
+
+def prune_versions(namespace_folder: Path, version: str):
+    if not os.path.isdir(namespace_folder):
+        return
+    for name in os.listdir(namespace_folder):
+        if name != version:
+            shutil.rmtree(os.path.join(namespace_folder, name), ignore_errors=True)
+
+
+class FileCache:
+    # values stored on disk (json or pickle), one file per key (usually a content hash), in a
+    # folder per format version of the namespace: the folders of the other versions are removed
+
+    def __init__(self, path: Optional[Path], namespace: str, version: str, serializer=json):
+        self.folder = os.path.join(os.path.expanduser(path), namespace, version) if path else None
+        self.serializer = serializer
+        self.binary = serializer is pickle
+        if self.folder:
+            prune_versions(os.path.dirname(self.folder), version)
+
+    def _key_path(self, key: str) -> Path:
+        return os.path.join(self.folder, key[:2], key + ('.pickle' if self.binary else '.json'))
+
+    def get(self, key: str) -> Any:
+        if not self.folder:
+            return None
+        try:
+            with open(self._key_path(key), 'rb' if self.binary else 'r') as f:
+                return self.serializer.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key: str, value: Any):
+        if not self.folder:
+            return value
+        key_path = self._key_path(key)
+        os.makedirs(os.path.dirname(key_path), exist_ok=True)
+        tmp_path = f"{key_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb' if self.binary else 'w') as f:
+            self.serializer.dump(value, f)
+        os.replace(tmp_path, key_path)  # concurrent writers are fine
+        return value
@@ -0,0 +1,265 @@
+import ast
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from . import parser
+from . import query
+from .cache import FileCache, file_digest
+from .utils import _logger, Path, PARALLEL_PARSE_THRESHOLD
+
+# members of odoo.models.BaseModel, which is not part of any addon,
+# when the odoo sources are not among the paths
+BASE_MODEL_ATTRIBUTES = frozenset((
+    'env', 'pool', 'id', 'ids', 'display_name',
+    'create_uid', 'create_date', 'write_uid', 'write_date',
+    '_name', '_description', '_table', '_inherit', '_inherits', '_order',
+    '_rec_name', '_fields', '_context', '_cr', '_uid', '_ids', '_origin',
+    '_prefetch_ids', '_parent_name', '_active_name', '_check_company_auto',
+    '_transient', '_abstract', '_auto', '_log_access', '_parent_store',
+    'browse', 'search', 'search_count', 'search_read', 'search_fetch',
+    'read', 'read_group', '_read_group', 'create', 'write', 'unlink', 'copy',
+    'copy_data', 'exists', 'ensure_one', 'filtered', 'filtered_domain',
+    'mapped', 'sorted', 'grouped', 'sudo', 'with_context', 'with_user',
+    'with_company', 'with_env', 'with_prefetch', 'name_get', 'name_search',
+    '_name_search', 'name_create', 'default_get', 'fields_get',
+    'get_metadata', 'get_external_id', '_get_external_ids', 'export_data',
+    'load', 'new', 'update', 'onchange', 'toggle_active', 'action_archive',
+    'action_unarchive', 'invalidate_cache', 'invalidate_recordset',
+    'invalidate_model', 'flush', 'flush_recordset', 'flush_model', 'modified',
+    'recompute', 'check_access_rights', 'check_access_rule',
+    'check_field_access_rights', '_check_company', '_check_recursion',
+    'user_has_groups', '_search', '_where_calc', '_apply_ir_rules',
+    '_validate_fields', '_register_hook', 'init', 'union', 'concat',
+    '_compute_display_name', '_rec_names_search', 'has_access',
+))
+# BaseModel members that its class body does not declare (slots, magic fields)
+DYNAMIC_BASE_MODEL_ATTRIBUTES = frozenset((
+    'env', 'id', 'display_name', 'create_uid', 'create_date', 'write_uid', 'write_date',
+    '_ids', '_prefetch_ids',
+))
+# models whose members are visible on every model (e.g. web extends 'base')
+UNIVERSAL_MODELS = ('base',)
+SCAN_FORMAT = "1"  # cache version of scan_file results, to bump when they change
+
+Access = List  # [model, method, name, lineno]
+Finding = Dict
+
+
+def is_self(node) -> bool:
+    return isinstance(node, ast.Name) and node.id == 'self'
+
+
+def class_model_name(a_c) -> Optional[str]:
+    specials = {}
+    for assign in parser.all_assigns(a_c):
+        if parser.is_assign_special(assign):
+            try:
+                specials.update([parser.parse_class_assign(assign)])
+            except Exception:
+                pass
+    return query.get_class_name(specials)
+
+
+def class_attribute_names(a_c) -> List[str]:
+    # class level assigns that the model parser does not keep
+    return sorted({
+        target.id
+        for assign in parser.all_assigns(a_c)
+        if not parser.is_assign_field(assign) and not parser.is_assign_special(assign)
+        for target in assign.targets if isinstance(target, ast.Name)
+    })
+
+
+def function_accesses(model: str, function) -> List[Access]:
+    receivers = {'self'}
+    for node in ast.walk(function):
+        if isinstance(node, (ast.For, ast.comprehension)) and is_self(node.iter):
+            if isinstance(node.target, ast.Name):
+                receivers.add(node.target.id)
+    accesses = {
+        (node.attr, node.lineno)
+        for node in ast.walk(function)
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+        and node.value.id in receivers and not node.attr.startswith('__')
+    }
+    return [[model, function.name, name, lineno] for name, lineno in sorted(accesses)]
+
+
+def odoo_models_file(paths: [Path]) -> Optional[Path]:
+    # normalize_paths turns the odoo root into root/addons and root/odoo/addons
+    for path in paths:
+        folder = os.path.dirname(path.rstrip('/'))
+        if os.path.basename(path.rstrip('/')) == 'addons' and os.path.basename(folder) == 'odoo':
+            if os.path.isfile(os.path.join(folder, 'models.py')):
+                return os.path.join(folder, 'models.py')
+    return None
+
+
+def parse_base_model_attributes(models_file: Path) -> Optional[frozenset]:
+    a = ast.parse(open(models_file, 'r').read())
+    base_model = next((c for c in parser.all_classes(a) if c.name == 'BaseModel'), None)
+    if base_model is None:
+        return None
+    names = set()
+    for node in base_model.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names.update(t.id for t in targets if isinstance(t, ast.Name))
+    return frozenset(names) | DYNAMIC_BASE_MODEL_ATTRIBUTES
+
+
+def base_model_attributes(context) -> frozenset:
+    def compute():
+        models_file = odoo_models_file(context.paths)
+        if models_file:
+            try:
+                attributes = parse_base_model_attributes(models_file)
+                if attributes:
+                    return attributes
+            except Exception:
+                _logger.exception("Parsing %s:" % models_file)
+            _logger.warning(f"Could not read BaseModel from {models_file}, using the known members.")
+        return BASE_MODEL_ATTRIBUTES
+    return context.cache('base_model').memoize(tuple(context.paths), compute)
+
+
+def scan_file(file_name: Path) -> Dict:
+    a = ast.parse(open(file_name, 'r').read())
+    accesses: List[Access] = []
+    attributes: Dict[str, List[str]] = {}
+    for odoo_class in parser.all_classes(a):
+        model = class_model_name(odoo_class)
+        if not model:
+            continue
+        attributes.setdefault(model, []).extend(class_attribute_names(odoo_class))
+        for function in parser.all_functions(odoo_class):
+            accesses += function_accesses(model, function)
+    return {'accesses': accesses, 'attributes': attributes}
+
+
+def scan_files(file_names: [Path], options: Dict, verbose: bool = True) -> Dict[Path, Dict]:
+    cache = FileCache(options.get('cache_path'), 'check', SCAN_FORMAT)
+    digests = {f: file_digest(f) for f in file_names}
+    scans = {f: cache.get(digests[f]) for f in file_names}
+    missing = [f for f, scan in scans.items() if scan is None]
+    if verbose:
+        _logger.info(f"Checking {len(missing)} files ({len(file_names) - len(missing)} cached).")
+    if len(missing) <= PARALLEL_PARSE_THRESHOLD or options.get('jobs') == 1:
+        results = [safe_scan_file(f) for f in missing]
+    else:
+        with ProcessPoolExecutor(max_workers=options.get('jobs')) as executor:
+            results = list(executor.map(safe_scan_file, missing, chunksize=64))
+    for file_name, scan in zip(missing, results):
+        if scan is not None:
+            scans[file_name] = cache.set(digests[file_name], scan)
+    return {f: scan for f, scan in scans.items() if scan is not None}
+
+
+def safe_scan_file(file_name: Path) -> Optional[Dict]:
+    try:
+        return scan_file(file_name)
+    except Exception:
+        _logger.exception("Checking %s:" % file_name)
+        return None
+
+
+def build_symbol_index(class_list) -> Dict[str, Dict[str, Set[str]]]:
+    # {model: {field or method: {defining modules}}}
+    symbols: Dict[str, Dict[str, Set[str]]] = {}
+    for entity in ('fields', 'functions'):
+        for (name, model), definitions in query.get_all_entities(entity, class_list).items():
+            symbols.setdefault(model, {}).setdefault(name, set()).update(definitions)
+    return symbols
+
+
+def build_model_parents(class_list) -> Dict[str, Set[str]]:
+    parents: Dict[str, Set[str]] = {}
+    for c in class_list:
+        model = query.get_class_name(c)
+        if not model:
+            continue
+        inherits = c.get('_inherit') or []
+        inherits = [inherits] if isinstance(inherits, str) else inherits
+        delegated = list(c.get('_inherits', {}))
+        parents.setdefault(model, set()).update(
+            p for p in inherits + delegated if p != model)
+    return parents
+
+
+def model_ancestry(model: str, parents: Dict[str, Set[str]]) -> Set[str]:
+    ancestry = {model}
+    todo = [model]
+    while todo:
+        for parent in parents.get(todo.pop(), ()):
+            if parent not in ancestry:
+                ancestry.add(parent)
+                todo.append(parent)
+    return ancestry.union(UNIVERSAL_MODELS)
+
+
+def module_closures(all_module_deps) -> Dict[str, Set[str]]:
+    return {
+        module: {m['name'] for level in deps['dependencies'] for m in level} | {module}
+        for module, deps in all_module_deps.items()
+    }
+
+
+def visible_symbols(model, symbols, parents, memo) -> Dict[str, Set[str]]:
+    if model not in memo:
+        visible: Dict[str, Set[str]] = {}
+        for ancestor in model_ancestry(model, parents):
+            for name, modules in symbols.get(ancestor, {}).items():
+                visible.setdefault(name, set()).update(modules)
+        memo[model] = visible
+    return memo[model]
+
+
+def check_references(class_list, scans: Dict[Path, Dict], all_module_deps,
+                     base_attributes=BASE_MODEL_ATTRIBUTES) -> List[Finding]:
+    symbols = build_symbol_index(class_list)
+    for file_name, scan in scans.items():
+        module = parser.module_name_from_path(file_name)
+        for model, names in scan['attributes'].items():
+            for name in names:
+                symbols.setdefault(model, {}).setdefault(name, set()).add(module)
+    parents = build_model_parents(class_list)
+    closures = module_closures(all_module_deps)
+    memo: Dict[str, Dict[str, Set[str]]] = {}
+
+    findings = []
+    for file_name in sorted(scans):
+        module = parser.module_name_from_path(file_name)
+        closure = closures.get(module, {module})
+        for model, method, name, lineno in scans[file_name]['accesses']:
+            if name in base_attributes or model not in symbols:
+                continue
+            defined_in = visible_symbols(model, symbols, parents, memo).get(name)
+            if not defined_in:
+                problem = 'missing'
+            elif not defined_in & closure:
+                problem = 'not visible'
+            else:
+                continue
+            findings.append({
+                'module': module,
+                'model': model,
+                'method': method,
+                'name': name,
+                'file': file_name,
+                'lineno': lineno,
+                'problem': problem,
+                'defined_in': sorted(defined_in or ()),
+            })
+    return findings
+
+
+def check_files(file_names: [Path], class_list, all_module_deps, options: Dict, scans=None,
+                base_attributes=BASE_MODEL_ATTRIBUTES) -> List[Finding]:
+    if scans is None:
+        scans = scan_files(file_names, options)
+    findings = check_references(class_list, scans, all_module_deps, base_attributes)
+    _logger.info(f"Reference check found {len(findings)} problems.")
+    return findings
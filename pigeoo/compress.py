@@ -0,0 +1,111 @@
+import gzip
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from queue import Queue
+from typing import Dict, Optional
+
+from .utils import _logger, Path
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+ENCODINGS = ('gz', 'br')
+MIN_SIZE = 256  # smaller files are not worth a compressed sibling
+BUNDLE_SUFFIX = ".zip"
+
+# the compressor of the output being rendered, if any
+current: ContextVar = ContextVar('compressor', default=None)
+
+
+def compress_gz(content: bytes) -> bytes:
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def compress_br(content: bytes) -> bytes:
+    return brotli.compress(content, quality=11)
+
+
+class Compressor:
+    # writes .gz/.br siblings of the output files and/or adds them to a zip bundle,
+    # in threads (zlib and brotli release the GIL) while the next pages are rendered
+
+    def __init__(self, output_path: Path, encodings=(), bundle: bool = False, jobs: Optional[int] = None):
+        self.output_path = output_path
+        self.encodings = [e for e in encodings if e != 'br' or brotli]
+        if len(self.encodings) < len(encodings):
+            _logger.warning("brotli is not installed, no .br files will be written.")
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.futures = []
+        self.bundle_queue: Optional[Queue] = None
+        if bundle:
+            self.bundle_queue = Queue(maxsize=1024)  # back-pressure on rendering
+            self.bundle_thread = threading.Thread(target=self.write_bundle, daemon=True)
+            self.bundle_thread.start()
+
+    def submit(self, file_name: Path):
+        self.futures.append(self.executor.submit(self.compress, file_name))
+
+    def compress(self, file_name: Path):
+        with open(file_name, 'rb') as f:
+            content = f.read()
+        name = os.path.relpath(file_name, self.output_path)
+        if self.bundle_queue is not None:
+            self.bundle_queue.put((name, content, zipfile.ZIP_DEFLATED))
+        if len(content) < MIN_SIZE:
+            return
+        for encoding in self.encodings:
+            compressed = compress_gz(content) if encoding == 'gz' else compress_br(content)
+            with open(file_name + '.' + encoding, 'wb') as f:
+                f.write(compressed)
+            if self.bundle_queue is not None:
+                self.bundle_queue.put((name + '.' + encoding, compressed, zipfile.ZIP_STORED))
+
+    def write_bundle(self):
+        bundle_name = self.output_path.rstrip('/') + BUNDLE_SUFFIX
+        with zipfile.ZipFile(bundle_name + '.tmp', 'w', compresslevel=6) as bundle:
+            while True:
+                item = self.bundle_queue.get()
+                if item is None:
+                    break
+                name, content, compression = item
+                bundle.writestr(name, content, compress_type=compression)
+        os.replace(bundle_name + '.tmp', bundle_name)
+
+    def close(self):
+        for future in self.futures:
+            future.result()
+        self.executor.shutdown()
+        if self.bundle_queue is not None:
+            self.bundle_queue.put(None)
+            self.bundle_thread.join()
+            _logger.info(f"Bundled the documentation in {self.output_path.rstrip('/') + BUNDLE_SUFFIX}")
+
+
+def written(file_name: Path) -> Path:
+    # called for each output file once it is complete
+    compressor = current.get()
+    if compressor is not None:
+        compressor.submit(file_name)
+    return file_name
+
+
+@contextmanager
+def compressing(output_path: Path, options: Dict, bundle: bool = True):
+    encodings = options.get('compress') or ()
+    bundle = bundle and options.get('bundle')
+    if not encodings and not bundle:
+        yield None
+        return
+    compressor = Compressor(output_path, encodings, bundle, options.get('jobs'))
+    token = current.set(compressor)
+    try:
+        yield compressor
+    finally:
+        current.reset(token)
+        compressor.close()
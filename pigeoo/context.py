@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .records import FileTable
+from .utils import _logger, Path
+
+DEFAULT_CACHE_SIZE = 1 << 16
+MISSING = object()
+
+
+class BoundedCache:
+    # least recently used entries are evicted past maxsize
+
+    def __init__(self, name: str, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: Hashable, default=None) -> Any:
+        value = self.entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> Any:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def memoize(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = self.set(key, compute())
+        return value
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class BuildContext:
+    # state of one build: its paths, file table and caches
+
+    def __init__(self, paths: [Path], maxsize: int = DEFAULT_CACHE_SIZE):
+        self.paths = tuple(paths)
+        self.maxsize = maxsize
+        self.files = FileTable()
+        self.caches: Dict[str, BoundedCache] = {}
+
+    def cache(self, name: str, maxsize: Optional[int] = None) -> BoundedCache:
+        if name not in self.caches:
+            self.caches[name] = BoundedCache(name, maxsize or self.maxsize)
+        return self.caches[name]
+
+    def clear(self, *names: str):
+        for name, cache in self.caches.items():
+            if not names or name in names:
+                cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: cache.stats() for name, cache in sorted(self.caches.items())}
+
+    def log_stats(self):
+        for name, stats in self.stats().items():
+            _logger.info(f"Cache {name}: {stats['hits']} hits, {stats['misses']} misses, "
+                         f"{stats['size']} entries, {stats['evictions']} evictions.")
@@ -0,0 +1,118 @@
+import ast
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+from . import query
+from .utils import _logger, Path, file_write
+
+MODEL_DATA = "models.json"
+
+Summary = Dict
+Report = Dict
+
+
+def model_summaries(class_list) -> Dict[str, Summary]:
+    # line numbers and paths are left out: they change without the api changing
+    summaries: Dict[str, Summary] = {}
+    for model, fields in query.get_model_fields(class_list).items():
+        summaries.setdefault(model, {'fields': {}, 'functions': {}})['fields'] = fields
+    for (function, model), definitions in query.get_all_functions(class_list).items():
+        functions = summaries.setdefault(model, {'fields': {}, 'functions': {}})['functions']
+        functions[function] = {
+            'args': {module: d['args'] for module, d in sorted(definitions.items())},
+        }
+    return summaries
+
+
+def model_digest(summary: Summary) -> str:
+    return hashlib.sha1(json.dumps(summary, sort_keys=True).encode()).hexdigest()
+
+
+def model_data(class_list) -> Dict:
+    summaries = model_summaries(class_list)
+    return {
+        'digests': {model: model_digest(s) for model, s in summaries.items()},
+        'models': summaries,
+    }
+
+
+def write_model_data(class_list, output_path: Path) -> str:
+    return file_write(json.dumps(model_data(class_list), sort_keys=True),
+                      os.path.join(output_path, MODEL_DATA))
+
+
+def load_output(output_path: Path) -> Dict:
+    with open(os.path.join(output_path, "options.py"), 'r') as f:
+        options = ast.literal_eval(f.read())
+    model_file = os.path.join(output_path, MODEL_DATA)
+    if os.path.exists(model_file):
+        with open(model_file, 'r') as f:
+            data = json.load(f)
+    else:
+        _logger.info(f"No {MODEL_DATA} in {output_path}, reading all_classes.py.")
+        with open(os.path.join(output_path, "all_classes.py"), 'r') as f:
+            data = model_data(ast.literal_eval(f.read()))
+    data['options'] = options
+    return data
+
+
+def diff_entities(old: Dict, new: Dict, compare) -> Dict[str, List]:
+    changed = [
+        {'name': name, 'old': old[name], 'new': new[name]}
+        for name in sorted(set(old) & set(new)) if compare(old[name], new[name])
+    ]
+    return {
+        'added': sorted(set(new) - set(old)),
+        'removed': sorted(set(old) - set(new)),
+        'changed': changed,
+    }
+
+
+def field_signature(field: Dict) -> Dict:
+    return {k: v for k, v in field.items() if k != 'modules'}
+
+
+def function_signatures(function: Dict) -> set:
+    # a new override with the same arguments does not change the api
+    return {tuple(args) for args in function['args'].values()}
+
+
+def diff_overriders(old: Dict, new: Dict) -> List[Dict]:
+    result = []
+    for name in sorted(set(old) & set(new)):
+        added = sorted(set(new[name]['args']) - set(old[name]['args']))
+        removed = sorted(set(old[name]['args']) - set(new[name]['args']))
+        if added or removed:
+            result.append({'name': name, 'added': added, 'removed': removed})
+    return result
+
+
+def diff_model(old: Summary, new: Summary) -> Dict:
+    functions = diff_entities(old['functions'], new['functions'],
+                              lambda o, n: function_signatures(o) != function_signatures(n))
+    functions['overriders'] = diff_overriders(old['functions'], new['functions'])
+    return {
+        'fields': diff_entities(old['fields'], new['fields'],
+                                lambda o, n: field_signature(o) != field_signature(n)),
+        'functions': functions,
+    }
+
+
+def diff_outputs(old: Dict, new: Dict) -> Report:
+    old_digests, new_digests = old['digests'], new['digests']
+    changed_models = sorted(
+        m for m in set(old_digests) & set(new_digests) if old_digests[m] != new_digests[m])
+    models = {m: diff_model(old['models'][m], new['models'][m]) for m in changed_models}
+    changed = {m: d for m, d in models.items() if any(
+        e[k] for e in (d['fields'], d['functions']) for k in e)}
+    return {
+        'old': {k: old['options'].get(k) for k in ('versions', 'hashes')},
+        'new': {k: new['options'].get(k) for k in ('versions', 'hashes')},
+        'added': sorted(set(new_digests) - set(old_digests)),
+        'removed': sorted(set(old_digests) - set(new_digests)),
+        # a different digest with no api difference (e.g. reordered definitions) counts as unchanged
+        'unchanged': len(set(old_digests) & set(new_digests)) - len(changed),
+        'changed': changed,
+    }
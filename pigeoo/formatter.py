@@ -1,13 +1,16 @@
+import os
 from typing import Dict
 
 from lxml.builder import E
 from lxml.html.builder import CLASS  # type: ignore
 
 from . import parser
+from .metrics import COLUMNS as metrics_columns
 
 
 WEB_ICON = "🌐"
 LINK_ICON = "🔗"
+LAZY_PREVIEW = 5  # module names shown on a collapsed level
 
 
 def html_link(link: str, name: str=""):
@@ -24,10 +27,10 @@ def header_to_ethtml(name: str):
     return e
 
 
-def class_to_ethtml(odoo_class, options: Dict):
+def class_to_ethtml(odoo_class, options: Dict, context):
     root = E.div(CLASS("flowy maxthird"))
 
-    github_link = parser.web_link(odoo_class['file'], options)
+    github_link = parser.web_link(odoo_class['file'], options, context)
     details = E.details()
     if options['local']:
         span = [html_link(odoo_class['full path'], odoo_class['module'])]
@@ -78,17 +81,32 @@ def class_to_ethtml(odoo_class, options: Dict):
     return root
 
 
-def class_tree_to_ethtml(class_tree, options):
+def class_tree_to_ethtml(class_tree, options, context):
     e = E.div(CLASS("blocky"), E.h2("Class tree"))
     for level in class_tree:
         l = E.div(CLASS("flowy-row f_c"))
         for odoo_class in level:
-            l.append(class_to_ethtml(odoo_class, options))
+            l.append(class_to_ethtml(odoo_class, options, context))
         e.append(l)
     return e
 
 
-def inheritance_tree_to_ethtml(module_tree, options: Dict):
+def lazy_tree_to_ethtml(tree, fragment: str, key: str):
+    # one collapsed summary per level, filled from the module fragment when opened
+    e = E.div(CLASS("growy"))
+    for index, level in enumerate(tree):
+        names = sorted(m["name"] if isinstance(m, dict) else m for m in level)
+        preview = ", ".join(names[:LAZY_PREVIEW]) + (", …" if len(names) > LAZY_PREVIEW else "")
+        summary = E.summary(f"Level {index}: {len(names)} modules ({preview})")
+        e.append(E.details(CLASS("flowy-row f_c lazy"), summary, **{
+            "data-fragment": fragment, "data-tree": key, "data-level": str(index)}))
+    return e
+
+
+def inheritance_tree_to_ethtml(module_tree, options: Dict, fragment: str = ""):
+    if fragment:
+        return E.div(CLASS("blocky"), E.h2("Inheritance tree"),
+                     lazy_tree_to_ethtml(module_tree, fragment, "dependencies"))
     e = E.div(CLASS("growy"))
     for level in module_tree:
         l = E.div(CLASS("flowy-row f_c"))
@@ -105,7 +123,10 @@ def inheritance_tree_to_ethtml(module_tree, options: Dict):
     return E.div(CLASS("blocky"), E.h2("Inheritance tree"), e)
 
 
-def inherited_tree_to_ethtml(depending_list, options: Dict):
+def inherited_tree_to_ethtml(depending_list, options: Dict, fragment: str = ""):
+    if fragment:
+        return E.div(CLASS("blocky"), E.h2("Depending modules"),
+                     lazy_tree_to_ethtml(depending_list, fragment, "depending"))
     e = E.div(CLASS("growy"))
     for level in depending_list:
         l = E.div(CLASS("flowy-row f_c"))
@@ -115,6 +136,17 @@ def inherited_tree_to_ethtml(depending_list, options: Dict):
     return E.div(CLASS("blocky"), E.h2("Depending modules"), e)
 
 
+def module_tree_fragment(module_tree, options: Dict) -> Dict:
+    # data of the lazy levels, in the order they are summarized
+    dependencies = [
+        [{"name": m["name"], "path": m["path"] if options["local"] else None, "link": m["link"]}
+         for m in sorted(level, key=lambda m: m["name"])]
+        for level in module_tree['dependencies']
+    ]
+    depending = [sorted(level) for level in module_tree['depending']]
+    return {"dependencies": dependencies, "depending": depending}
+
+
 def functions_to_ethtml(name, fdict, options: Dict):
     e = E.div(CLASS("growy"))
     for model in fdict:
@@ -122,3 +154,130 @@ def functions_to_ethtml(name, fdict, options: Dict):
         l = E.div(CLASS("flowy-row f_c"), E.h4(model), ul)
         e.append(l)
     return E.div(CLASS("blocky"), E.h2(name), e)
+
+
+def table_to_ethtml(headers, rows, sortable=False):
+    e = E.table(CLASS("tably sortable" if sortable else "tably"), E.tr(*[E.th(h) for h in headers]))
+    for row in rows:
+        e.append(E.tr(*[E.td(*(c if isinstance(c, list) else [str(c)])) for c in row]))
+    return e
+
+
+def audit_to_ethtml(audit, options: Dict):
+    findings = [
+        [[f['model'], internal_link(f['model'])], f['field'], f['type'], f['reason'],
+         ", ".join(f['modules'])]
+        for f in audit['findings']
+    ]
+    widths = sorted(audit['widths'].items(), key=lambda i: -i[1]['width'])
+    widths = [[[m, internal_link(m)], w['columns'], w['width']] for m, w in widths]
+    return E.div(
+        CLASS("blocky"),
+        E.h2("Stored fields without index"),
+        table_to_ethtml(["Model", "Field", "Type", "Used in", "Modules"], findings),
+        E.h2("Estimated table width"),
+        table_to_ethtml(["Model", "Columns", "Bytes per row"], widths),
+    )
+
+
+def metrics_to_ethtml(metrics, options: Dict):
+    headers = ["Model", "Extending modules", "Fields", "Methods", "Overridden methods",
+               "Override depth", "Many2one fan-out", "Many2one fan-in"]
+    rows = [[[m['model'], internal_link(m['model'])]] + [m[c] for c in metrics_columns[1:]] for m in metrics]
+    return E.div(
+        CLASS("blocky"),
+        E.p("Click on a column header to sort. Data in ", html_link("metrics.csv"), "."),
+        table_to_ethtml(headers, rows, sortable=True),
+    )
+
+
+def field_node_to_ethtml(node):
+    model, field = node
+    return [E.span(f"{model} / {field}", internal_link(model), CLASS("blocky"))]
+
+
+def field_nodes_to_ethtml(nodes):
+    return [e for node in nodes for e in field_node_to_ethtml(node)]
+
+
+def recompute_to_ethtml(report, options: Dict):
+    fan_outs = [[field_node_to_ethtml(node), count] for node, count in report['fan_outs']]
+    cycles = [[field_nodes_to_ethtml(cycle)] for cycle in report['cycles']]
+    unresolved = [[field_node_to_ethtml(node), path] for node, path in report['unresolved']]
+    return E.div(
+        CLASS("blocky"),
+        E.h2("Largest recompute fan-outs"),
+        table_to_ethtml(["Field", "Fields recomputed"], fan_outs),
+        E.h2("Cycles"),
+        table_to_ethtml(["Fields"], cycles),
+        E.h2("Unresolved dependencies"),
+        table_to_ethtml(["Field", "Path"], unresolved),
+    )
+
+
+def model_recompute_to_ethtml(model_graph, options: Dict):
+    rows = [
+        [field, field_nodes_to_ethtml(edges['upstream']), field_nodes_to_ethtml(edges['downstream'])]
+        for field, edges in model_graph.items()
+    ]
+    return E.div(
+        CLASS("blocky"),
+        E.h2("Recompute graph"),
+        table_to_ethtml(["Field", "Depends on", "Triggers"], rows),
+    )
+
+
+def location_to_ethtml(file_name: str, lineno: int, options: Dict, context):
+    name = f"{os.path.basename(file_name)}:{lineno}"
+    span = [html_link(file_name, name)] if options['local'] else [name]
+    github_link = parser.web_link(file_name, options, context)
+    if github_link:
+        span.append(html_link(github_link + "#L" + str(lineno), WEB_ICON))
+    return [E.span(*span)]
+
+
+def check_to_ethtml(findings, options: Dict, context):
+    rows = [
+        [f['module'], [f['model'], internal_link(f['model'])], f['method'], f['name'],
+         f['problem'], ", ".join(f['defined_in']), location_to_ethtml(f['file'], f['lineno'], options, context)]
+        for f in findings
+    ]
+    headers = ["Module", "Model", "Method", "Name", "Problem", "Defined in", "Location"]
+    return E.div(CLASS("blocky"), E.h2("Field and method references"), table_to_ethtml(headers, rows))
+
+
+def entity_diff_to_ethtml(name: str, entity_diff, describe):
+    rows = [[n, "added", ""] for n in entity_diff['added']]
+    rows += [[n, "removed", ""] for n in entity_diff['removed']]
+    rows += [[c['name'], "changed", f"{describe(c['old'])} → {describe(c['new'])}"]
+             for c in entity_diff['changed']]
+    rows += [[o['name'], "overriders", " ".join([f"+{m}" for m in o['added']] + [f"-{m}" for m in o['removed']])]
+             for o in entity_diff.get('overriders', [])]
+    return E.details(E.summary(f"{name} ({len(rows)})"), table_to_ethtml(["Name", "", ""], rows))
+
+
+def diff_to_ethtml(report, options: Dict):
+    def describe_field(f):
+        return ", ".join(f"{k}={v}" for k, v in sorted(f.items()) if k != 'modules')
+
+    def describe_function(f):
+        return " ".join(f"{m}({', '.join(args)})" for m, args in f['args'].items())
+
+    e = E.div(
+        CLASS("blocky"),
+        E.h2("Models"),
+        E.div(CLASS("blocky"), f"{report['unchanged']} unchanged models."),
+        E.details(E.summary(f"Added ({len(report['added'])})"),
+                  *[E.div(m, CLASS("indnt")) for m in report['added']]),
+        E.details(E.summary(f"Removed ({len(report['removed'])})"),
+                  *[E.div(m, CLASS("indnt")) for m in report['removed']]),
+        E.h2(f"Changed models ({len(report['changed'])})"),
+    )
+    for model, model_diff in sorted(report['changed'].items()):
+        e.append(E.div(
+            CLASS("flowy"),
+            E.h4(model),
+            entity_diff_to_ethtml("Fields", model_diff['fields'], describe_field),
+            entity_diff_to_ethtml("Functions", model_diff['functions'], describe_function),
+        ))
+    return e
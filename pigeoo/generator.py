@@ -1,20 +1,42 @@
+import json
 import os
+import pickle
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from lxml import etree  # type: ignore
 from lxml.builder import ElementMaker,E  # type: ignore
 from lxml.html.builder import CLASS  # type: ignore
 from pprint import pformat as pf
 
-from typing import Dict
+from typing import Dict, List
 
+from . import audit
+from . import check
+from . import compress
+from . import diff
 from . import formatter
+from . import metrics
 from . import parser
 from . import query
+from . import recompute
+from . import shard
+from .cache import FileCache, file_digest
+from .context import BuildContext
 from .parser import InfoDepTree
-from .utils import _logger, Path, file_write
+from .scheduler import PROCESS, SERIAL, Scheduler
+from .utils import _logger, Path, PARALLEL_PARSE_THRESHOLD, file_write
 
 
 STYLE = "style.css"
+SCRIPT = "fragments.js"
+SORT_SCRIPT = "sortable.js"
+FRAGMENTS = "fragments"
+REPORTS = ('audit', 'metrics', 'recompute', 'check')
+LAZY_TREE_THRESHOLD = 100  # modules in a page's trees above which levels load on demand
+
+
+def output_write(content, output_name):
+    return compress.written(file_write(content, output_name))
 
 
 def index_class_name():
@@ -25,38 +47,79 @@ def index_module_name():
     return "index_module.html"
 
 
-def format_class_tree_to_html(index_name, module_tree, class_tree, output_path: Path, options: Dict):
+def index_audit_name():
+    return "index_audit.html"
+
+
+def index_metrics_name():
+    return "index_metrics.html"
+
+
+def index_recompute_name():
+    return "index_recompute.html"
+
+
+def index_check_name():
+    return "index_check.html"
+
+
+def format_class_tree_to_html(index_name, module_tree, class_tree, output_path: Path, options: Dict, graph, context):
+    class_name, body = model_page_body(index_name, module_tree, class_tree, options, context)
+    return model_page_write(class_name, body, output_path, options, graph)
+
+
+def model_page_body(index_name, module_tree, class_tree, options: Dict, context):
+    # everything but the recompute section, which needs the graph of all models
     class_name = ""
     for c in class_tree[0]:
      if c.get('_name'):
          class_name = c['_name']
-    title = class_name
-    file_name = class_name + '.html'
-
     body = [
-        E.h1(title),
+        E.h1(class_name),
         formatter.header_to_ethtml(index_name),
         formatter.inheritance_tree_to_ethtml(module_tree, options),
-        formatter.class_tree_to_ethtml(class_tree, options),
+        formatter.class_tree_to_ethtml(class_tree, options, context),
     ]
-    return html_write(title, body, file_name, output_path)
+    return class_name, body
 
 
-def html_write(title: str, body, file_name: str, output_path: Path):
+def model_page_write(class_name: str, body, output_path: Path, options: Dict, graph):
+    model_graph = recompute.model_graph(class_name, graph)
+    if model_graph:
+        body.append(formatter.model_recompute_to_ethtml(model_graph, options))
+    return html_write(class_name, body, class_name + '.html', output_path)
+
+
+def html_write(title: str, body, file_name: str, output_path: Path, scripts=()):
     body = E.body(*body)
-    content = html_generate(title, body)
-    file_write(content, os.path.join(output_path, file_name))
+    content = html_generate(title, body, scripts)
+    output_write(content, os.path.join(output_path, file_name))
     return title, file_name
 
 
+def module_tree_size(module_tree: InfoDepTree) -> int:
+    return sum(len(level) for key in ('dependencies', 'depending') for level in module_tree[key])
+
+
+def write_module_fragment(module: str, module_tree: InfoDepTree, output_path: Path, options):
+    # a script rather than plain json, so that pages also load it from file://
+    data = json.dumps(formatter.module_tree_fragment(module_tree, options), separators=(',', ':'))
+    content = f"pigeooFragment({json.dumps(module)}, {data});\n"
+    output_write(content, os.path.join(output_path, FRAGMENTS, module + '.js'))
+
+
 def format_module_tree_to_html(index_name: str, module: str, module_tree: InfoDepTree, output_path: Path, options):
+    fragment = ""
+    if module_tree_size(module_tree) > options.get('lazy_threshold', LAZY_TREE_THRESHOLD):
+        fragment = module
+        write_module_fragment(module, module_tree, output_path, options)
     body = [
         E.h1(module),
         formatter.header_to_ethtml(index_name),
-        formatter.inheritance_tree_to_ethtml(module_tree['dependencies'], options),
-        formatter.inherited_tree_to_ethtml(module_tree['depending'], options),
+        formatter.inheritance_tree_to_ethtml(module_tree['dependencies'], options, fragment),
+        formatter.inherited_tree_to_ethtml(module_tree['depending'], options, fragment),
     ]
-    return html_write(module, body, module + '.html', output_path)
+    return html_write(module, body, module + '.html', output_path, [SCRIPT] if fragment else [])
 
 
 def html_generate_index(title:str, name: str, file_names, output_path: Path):
@@ -70,16 +133,17 @@ def html_generate_index(title:str, name: str, file_names, output_path: Path):
 
     content = html_generate(title, body)
 
-    return file_write(content, index_file)
+    return output_write(content, index_file)
 
 
-def html_generate(title, body):
+def html_generate(title, body, scripts=()):
     M = ElementMaker()
     html = M.html(
         E.head(
             E.meta(charset="utf-8"),
             E.link(rel="stylesheet", href=STYLE, type="text/css"),
             E.title(title),
+            *[E.script("", src=script) for script in scripts],
         ),
         body,
         lang="en",
@@ -92,80 +156,200 @@ def html_generate(title, body):
     return result
 
 
-def html_generate_doc(class_list, output_path, options:Dict):
+def html_generate_doc(class_list, output_path, options:Dict, graph, context, all_class_names=None):
     index_name = index_class_name()
     title = "Odoo Class Index"
     file_names = [
-        format_class_tree_to_html(index_name, module_tree, class_tree, output_path, options)
+        format_class_tree_to_html(index_name, module_tree, class_tree, output_path, options, graph, context)
         for module_tree, class_tree in class_list
     ]
+    if all_class_names is not None:  # only some pages were rendered
+        file_names = [(name, name + '.html') for name in all_class_names]
     html_generate_index(title, index_name, file_names, output_path)
     return index_name
 
 
-def html_generate_modules(module_list, output_path, options:Dict):
+def html_generate_modules(module_list, output_path, options:Dict, modules=None):
+    os.makedirs(os.path.join(output_path, FRAGMENTS), exist_ok=True)
     index_name = index_module_name()
     title = "Odoo Module Index"
     file_names = [
         format_module_tree_to_html(index_name, module, dep_tree, output_path, options)
         for module, dep_tree in module_list.items()
+        if modules is None or module in modules
     ]
+    if modules is not None:  # only some pages were rendered
+        file_names = [(module, module + '.html') for module in module_list]
     html_generate_index(title, index_name, file_names, output_path)
     return index_name
 
 
-def main_generate_doc(paths: [Path], all_module_deps, output_path: Path, options:Dict):
+def safe_parse_model_file_values(model_file: Path):
+    try:
+        return parser.parse_model_file_values(parser.module_name_from_path(model_file), model_file)
+    except KeyboardInterrupt:
+        exit()
+    except Exception:
+        _logger.exception("Parsing %s:" % model_file)
+        return None
+
+
+def parse_models_values(models_files: [Path], options: Dict, verbose: bool = True) -> Dict[Path, list]:
+    cache = FileCache(options.get('cache_path'), 'parse', parser.PARSE_FORMAT, serializer=pickle)
+    digests = {f: file_digest(f) for f in models_files}
+    values = {f: cache.get(digests[f]) for f in models_files}
+    missing = [f for f, v in values.items() if v is None]
+    if verbose:
+        _logger.info(f"Parsing {len(missing)} files ({len(models_files) - len(missing)} cached).")
+    if len(missing) > PARALLEL_PARSE_THRESHOLD and options.get('jobs') != 1:
+        with ProcessPoolExecutor(max_workers=options.get('jobs')) as executor:
+            results = list(executor.map(safe_parse_model_file_values, missing, chunksize=64))
+    else:
+        results = [safe_parse_model_file_values(f) for f in missing]
+    for model_file, result in zip(missing, results):
+        if result is not None:
+            values[model_file] = cache.set(digests[model_file], result)
+    return {f: v for f, v in values.items() if v is not None}
+
+
+def parse_models_files(models_files: [Path], options: Dict, context) -> Dict[Path, list]:
+    return {
+        f: parser.models_from_file_values(parser.module_name_from_path(f), f, v, context.files)
+        for f, v in parse_models_values(models_files, options).items()
+    }
+
+
+def parse_models(paths: [Path], all_module_deps, options: Dict, context):
     all_modules = parser.modules_from_paths(paths, all_module_deps)
     all_models_files = parser.models_files_from_modules(all_modules)
-    all_model_dicts = []
-    for model_file in all_models_files:
-        try:
-            all_model_dicts.extend(parser.parse_model_file(
-                parser.module_name_from_path(model_file), model_file))
-        except KeyboardInterrupt:
-            exit()
-        except Exception as e:
-            _logger.exception("Parsing %s:" % model_file)
+    return all_models_files, parse_models_files(all_models_files, options, context)
+
+
+def flatten_classes(all_models_files: [Path], classes_by_file: Dict[Path, list]):
+    return [c for model_file in all_models_files for c in classes_by_file.get(model_file, [])]
 
-    file_write(pf(all_model_dicts), os.path.join(output_path, "all_classes.py"))
+
+def main_generate_data(all_model_dicts, output_path: Path):
+    output_write(pf([c.to_dict() for c in all_model_dicts]), os.path.join(output_path, "all_classes.py"))
+    compress.written(diff.write_model_data(all_model_dicts, output_path))
+
+
+def main_generate_models(paths: [Path], all_models_files, classes_by_file, all_module_deps,
+                         output_path: Path, options: Dict, context, names=None, graph=None, scans=None,
+                         reports=REPORTS):
+    # (re)render the pages of the given model names (all if None), the given reports and the class index
+    all_model_dicts = flatten_classes(all_models_files, classes_by_file)
+    if 'audit' in reports:
+        main_generate_audit(all_model_dicts, output_path, options)
+    if 'metrics' in reports:
+        main_generate_metrics(all_model_dicts, output_path, options)
+    graph = graph or recompute.build_graph(all_model_dicts)
+    if 'recompute' in reports:
+        main_generate_recompute(graph, output_path, options)
+    if options.get('check') and 'check' in reports:
+        main_generate_check(all_models_files, all_model_dicts, all_module_deps, output_path, options, context, scans)
 
     all_class_names = {c['_name'] for c in all_model_dicts if '_name' in c}
+    classes_by_name = query.get_classes_by_name(all_model_dicts)
 
     all_class_trees = []
-    for name in all_class_names:
+    for name in (all_class_names if names is None else all_class_names & set(names)):
         try:
-            c = parser.class_tree(name, all_model_dicts, paths, options, all_module_deps)
+            c = parser.class_tree(name, classes_by_name[name], paths, options, all_module_deps, context)
             all_class_trees.append(c)
         except KeyboardInterrupt:
             exit()
-        except Exception as e:
+        except Exception:
             _logger.exception("Processing %s:" % name)
 
-    return html_generate_doc(all_class_trees, output_path, options)
+    html_generate_doc(all_class_trees, output_path, options, graph, context,
+                      all_class_names=None if names is None else sorted(all_class_names))
+    return graph
+
+
+def main_generate_audit(all_model_dicts, output_path: Path, options: Dict) -> str:
+    index_audit = audit.audit_models(all_model_dicts)
+    output_write(pf(index_audit), os.path.join(output_path, "audit.py"))
+    title = "Odoo Index Audit"
+    body = [E.h1(title), formatter.audit_to_ethtml(index_audit, options)]
+    return html_write(title, body, index_audit_name(), output_path)[1]
+
+
+def main_generate_metrics(all_model_dicts, output_path: Path, options: Dict) -> str:
+    model_metrics = metrics.compute_metrics(all_model_dicts)
+    output_write(metrics.metrics_to_csv(model_metrics), os.path.join(output_path, "metrics.csv"))
+    title = "Odoo Model Metrics"
+    body = [E.h1(title), formatter.metrics_to_ethtml(model_metrics, options)]
+    return html_write(title, body, index_metrics_name(), output_path, [SORT_SCRIPT])[1]
+
 
+def main_generate_recompute(graph, output_path: Path, options: Dict) -> str:
+    report = recompute.graph_report(graph)
+    output_write(pf(report), os.path.join(output_path, "recompute.py"))
+    title = "Odoo Recompute Graph"
+    body = [E.h1(title), formatter.recompute_to_ethtml(report, options)]
+    return html_write(title, body, index_recompute_name(), output_path)[1]
 
-def generate_module_deps(paths: [Path], options:Dict):
-    all_modules = parser.modules_from_paths(paths)
+
+def main_generate_check(all_models_files, all_model_dicts, all_module_deps, output_path: Path, options: Dict, context, scans=None) -> str:
+    findings = check.check_files(all_models_files, all_model_dicts, all_module_deps, options, scans,
+                                 check.base_model_attributes(context))
+    output_write(pf(findings), os.path.join(output_path, "check.py"))
+    title = "Odoo Reference Check"
+    body = [E.h1(title), formatter.check_to_ethtml(findings, options, context)]
+    return html_write(title, body, index_check_name(), output_path)[1]
+
+
+def main_diff(old_path: Path, new_path: Path, output_path: Path):
+    _logger.info(f"Comparing {old_path} to {new_path}")
+    os.makedirs(output_path, mode=0o777, exist_ok=True)
+    report = diff.diff_outputs(diff.load_output(old_path), diff.load_output(new_path))
+    output_write(json.dumps(report, indent=1, sort_keys=True), os.path.join(output_path, "diff.json"))
+    title = f"Odoo API Diff: {old_path} → {new_path}"
+    body = [E.h1(title), formatter.diff_to_ethtml(report, {})]
+    html_write(title, body, "diff.html", output_path)
+    copy_static(output_path)
+    _logger.info("Diff has been generated.")
+
+
+def generate_module_deps(paths: [Path], options:Dict, context, all_modules=None):
+    if all_modules is None:
+        all_modules = parser.modules_from_paths(paths)
 
     all_module_deps = {}
     for m in all_modules:
-        deps = parser.module_dependencies_tree(m, paths)
-        ideps = parser.invert_dependencies(m, deps, paths)
+        deps = parser.module_dependencies_tree(m, paths, context)
+        ideps = parser.invert_dependencies(m, deps, paths, context)
         n = parser.module_name_from_path(m)
-        infos = parser.dep_tree_enrich(ideps, paths, options)
+        infos = parser.dep_tree_enrich(ideps, paths, options, context)
         all_module_deps.update({n: {'dependencies': infos}})
     return all_module_deps
 
 
 def compute_dependings(all_modules):
-    for mod in all_modules:
-        depending_flat = query.get_depending_modules(mod, all_modules)
-        all_modules[mod]['depending'] = query.treeify_modules(depending_flat, all_modules)
+    for mod, depending in module_dependings(all_modules, list(all_modules)).items():
+        all_modules[mod]['depending'] = depending
+
+
+def module_dependings(all_modules, names: [str]) -> Dict[str, list]:
+    # independent for each module, so that worker processes can share them
+    return {
+        mod: query.treeify_modules(query.get_depending_modules(mod, all_modules), all_modules)
+        for mod in names
+    }
 
 
-def main_generate_module_deps(all_module_deps, output_path: Path, options: Dict) -> str:
-    file_write(pf(all_module_deps), os.path.join(output_path, "all_modules.py"))
-    return html_generate_modules(all_module_deps, output_path, options)
+def dependency_names(all_modules):
+    # the part of the dependency trees that module_dependings reads, cheaper to send to workers
+    return {
+        mod: {'dependencies': [[{'name': d['name']} for d in level] for level in deps['dependencies']]}
+        for mod, deps in all_modules.items()
+    }
+
+
+def main_generate_module_deps(all_module_deps, output_path: Path, options: Dict, modules=None) -> str:
+    output_write(pf(all_module_deps), os.path.join(output_path, "all_modules.py"))
+    return html_generate_modules(all_module_deps, output_path, options, modules)
 
 
 def filter_modules(all_module_deps, options: Dict):
@@ -181,23 +365,226 @@ def filter_modules(all_module_deps, options: Dict):
     return result
 
 
-def copy_stylesheet(output_path):
+def copy_static(output_path):
     source = os.path.dirname(os.path.realpath(__file__))
-    stylesheet = os.path.join(source, "static/", STYLE)
-    shutil.copyfile(stylesheet, os.path.join(output_path, STYLE))
+    for name in (STYLE, SCRIPT, SORT_SCRIPT):
+        compress.written(shutil.copyfile(os.path.join(source, "static/", name), os.path.join(output_path, name)))
 
 
-def main(paths, output_path, options):
-    _logger.info("Starting documentation for " + output_path)
-    os.makedirs(output_path, mode=0o777, exist_ok=True)
-
-    all_module_deps = generate_module_deps(paths, options)
+def generate_all_module_deps(paths: [Path], options: Dict, context, all_modules=None):
+    all_module_deps = generate_module_deps(paths, options, context, all_modules)
     all_module_deps = filter_modules(all_module_deps, options)
     compute_dependings(all_module_deps)
-    main_generate_module_deps(all_module_deps, output_path, options)
-    main_generate_doc(paths, all_module_deps, output_path, options)
+    return all_module_deps
+
 
-    copy_stylesheet(output_path)
-    file_write(pf(options), os.path.join(output_path, "options.py"))
+def map_stage(paths: [Path], options: Dict, context, module_names=None, shard_name=None) -> shard.Artifact:
+    # parse a subset of the modules into an artifact that the merge stage renders without the addons
+    module_paths = shard.select_modules(paths, module_names, shard_name)
+    _logger.info(f"Mapping {len(module_paths)} modules.")
+    listings: Dict[Path, list] = {}
+    modules = []
+    for module_path in module_paths:
+        root = shard.module_root(module_path, paths)
+        modules.append({
+            'name': parser.module_name_from_path(module_path),
+            'path': module_path,
+            'root': root,
+            'rank': shard.module_rank(module_path, root, listings),
+            'manifest': parser.module_manifest(module_path, paths, context),
+            'files': parser.models_files_from_modules([module_path]),
+        })
+    models_files = [f for m in modules for f in m['files']]
+    return {
+        'version': shard.ARTIFACT_VERSION,
+        'paths': paths,
+        'options': {k: options.get(k) for k in shard.GIT_OPTIONS},
+        'modules': modules,
+        'classes': parse_models_values(models_files, options),
+        'full_paths': {f: os.path.realpath(f) for f in models_files},
+        'links': {p: parser.web_link(p, options, context) for p in module_paths + models_files},
+        'scans': check.scan_files(models_files, options) if options.get('check') else None,
+    }
+
+
+def merge_stage(artifacts: [shard.Artifact], output_path: Path, options: Dict, context=None):
+    unscanned = [str(i + 1) for i, a in enumerate(artifacts) if a['scans'] is None]
+    if options.get('check') and unscanned:
+        # the check would silently find nothing in their files
+        raise Exception(f"Some artifacts were mapped without --check (number {', '.join(unscanned)}), "
+                        "map them again with --check to merge with --check.")
+    paths = shard.merged_paths(artifacts)
+    context = context or BuildContext(paths)
+    modules = shard.merged_modules(artifacts, paths)
+    shard.seed_context(artifacts, modules, paths, context)
+    classes = {f: v for a in artifacts for f, v in a['classes'].items()}
+    scans = {f: v for a in artifacts for f, v in (a['scans'] or {}).items()}
+    sources = {
+        m['path']: {
+            'files': m['files'],
+            'values': {f: classes[f] for f in m['files'] if f in classes},
+            'scans': {f: scans[f] for f in m['files'] if f in scans},
+        }
+        for m in modules
+    }
+    return build(paths, modules, output_path, options, context, sources)
+
+
+def parse_module(module_path: Path, options: Dict) -> Dict:
+    # the models files of a module, their parsed values and reference scans, in a worker process
+    files = parser.models_files_from_modules([module_path])
+    options = dict(options, jobs=1)
+    return {
+        'files': files,
+        'values': parse_models_values(files, options, verbose=False),
+        'scans': check.scan_files(files, options, verbose=False) if options.get('check') else None,
+    }
+
+
+def write_data(data, file_name: Path) -> Path:
+    # the large data files are formatted in worker processes
+    return file_write(pf(data), file_name)
+
+
+def build(paths: [Path], modules: List[Dict], output_path: Path, options: Dict, context, sources=None):
+    # the generation as a graph of tasks: module pages are rendered while workers parse the modules,
+    # model pages while they format the data files.
+    # modules are {'name', 'path'} in listing order, sources their parsed files from map artifacts.
+    _logger.info("Starting documentation for " + output_path)
+    os.makedirs(output_path, mode=0o777, exist_ok=True)
+    workers = options.get('jobs') or os.cpu_count() or 1
+    if workers > 1:
+        processes = ProcessPoolExecutor(max_workers=workers)
+        processes.submit(int).result()  # fork the workers before any thread runs
+    else:
+        processes = ThreadPoolExecutor(max_workers=1)
+    serial = ThreadPoolExecutor(max_workers=1)  # the tasks sharing the build context
+    tasks = Scheduler({PROCESS: processes, SERIAL: serial}, {PROCESS: 2 * workers, SERIAL: 1})
+    state = {
+        'all_module_deps': {},
+        'files_by_module': {},
+        'classes_by_file': {},
+        'scans': {},
+        'pages': [],
+    }
+
+    def module_deps():
+        all_module_deps = generate_module_deps(paths, options, context, [m['path'] for m in modules])
+        all_module_deps = filter_modules(all_module_deps, options)
+        state['all_module_deps'] = all_module_deps
+        names = list(all_module_deps)
+        count = min(2 * workers, len(names))
+        dependency_trees = dependency_names(all_module_deps)
+        chunks = [
+            tasks.add(f'depending:{i}', module_dependings, dependency_trees, names[i::count],
+                      resource=PROCESS, priority=1)
+            for i in range(count)
+        ]
+        tasks.add('module_pages', module_pages, chunks, dependencies=chunks)
+
+    def module_pages(chunks):
+        all_module_deps = state['all_module_deps']
+        for chunk in chunks:
+            for mod, depending in tasks.take(chunk).items():
+                all_module_deps[mod]['depending'] = depending
+        write_data_task('all_modules', all_module_deps, "all_modules.py")
+        html_generate_modules(all_module_deps, output_path, options)
+
+    def write_data_task(name, data, file_name):
+        file_name = os.path.join(output_path, file_name)
+        tasks.add('data:' + name, write_data, data, file_name, resource=PROCESS)
+        tasks.add('written:' + name, compress.written, file_name, dependencies=['data:' + name])
+
+    def load(module):
+        if module['name'] not in state['all_module_deps']:
+            return
+        result = sources[module['path']] if sources else tasks.take('parse:' + module['path'])
+        state['files_by_module'][module['path']] = result['files']
+        for file_name, values in result['values'].items():
+            state['classes_by_file'][file_name] = parser.models_from_file_values(
+                module['name'], file_name, values, context.files)
+        state['scans'].update(result['scans'] or {})
+
+    def classes():
+        # a model can be extended by any module, so its tree waits for all of them
+        all_module_deps = state['all_module_deps']
+        all_models_files = [
+            f for m in modules if m['name'] in all_module_deps
+            for f in state['files_by_module'].get(m['path'], [])
+        ]
+        class_list = flatten_classes(all_models_files, state['classes_by_file'])
+        state['all_models_files'] = all_models_files
+        classes_by_name = query.get_classes_by_name(class_list)
+        for name in sorted({c['_name'] for c in class_list if '_name' in c}):
+            tasks.add('tree:' + name, tree, name, classes_by_name[name], priority=1, optional=True)
+        tasks.add('graph', graph, class_list, priority=2)
+
+    def tree(name, model_classes):
+        module_tree, class_tree = parser.class_tree(
+            name, model_classes, paths, options, state['all_module_deps'], context)
+        title, body = model_page_body(index_class_name(), module_tree, class_tree, options, context)
+        tasks.add('page:' + name, page, title, body, dependencies=['graph'], priority=1, optional=True)
+
+    def page(title, body):
+        state['pages'].append(model_page_write(title, body, output_path, options, state['graph']))
+
+    def graph(class_list):
+        all_models_files, all_module_deps = state['all_models_files'], state['all_module_deps']
+        state['graph'] = recompute.build_graph(class_list)
+        write_data_task('all_classes', [c.to_dict() for c in class_list], "all_classes.py")
+        tasks.add('data:models', lambda: compress.written(diff.write_model_data(class_list, output_path)))
+        tasks.add('audit', main_generate_audit, class_list, output_path, options)
+        tasks.add('metrics', main_generate_metrics, class_list, output_path, options)
+        tasks.add('recompute', main_generate_recompute, state['graph'], output_path, options)
+        if options.get('check'):
+            tasks.add('check', main_generate_check, all_models_files, class_list, all_module_deps,
+                      output_path, options, context, state['scans'])
+
+    with compress.compressing(output_path, options):
+        tasks.add('module_deps', module_deps, priority=4)
+        loads = []
+        for module in modules:
+            dependencies = ['module_deps']
+            if sources is None:
+                dependencies.append(tasks.add('parse:' + module['path'], parse_module, module['path'], options,
+                                              resource=PROCESS, priority=2))
+            loads.append(tasks.add('load:' + module['path'], load, module, dependencies=dependencies, priority=3))
+        tasks.add('classes', classes, dependencies=loads, priority=2)
+        _logger.info(f"Rendering {len(modules)} modules with {workers} workers.")
+        try:
+            tasks.run()
+        finally:
+            serial.shutdown(cancel_futures=True)
+            processes.shutdown(cancel_futures=True)
 
+        html_generate_index("Odoo Class Index", index_class_name(), state['pages'], output_path)
+        copy_static(output_path)
+        output_write(pf(options), os.path.join(output_path, "options.py"))
+
+    context.log_stats()
     _logger.info("Documentation has been generated.")
+    return {
+        'context': context,
+        'paths': paths,
+        'output_path': output_path,
+        'options': options,
+        'all_module_deps': state['all_module_deps'],
+        'all_models_files': state['all_models_files'],
+        'classes_by_file': state['classes_by_file'],
+        'scans': state['scans'] if options.get('check') else None,
+        'graph': state['graph'],
+    }
+
+
+def main(paths, output_path, options):
+    context = BuildContext(paths)
+    for repository, remote in options.get('remotes', {}).items():
+        context.cache('git_remote').set(repository, remote)
+    module_names = None
+    if options["modules"]:
+        module_names = shard.dependency_closure(options["modules"], paths, context)
+    modules = [
+        {'name': parser.module_name_from_path(m), 'path': m}
+        for m in shard.select_modules(paths, module_names)
+    ]
+    return build(paths, modules, output_path, options, context)
@@ -0,0 +1,69 @@
+import asyncio
+from asyncio.subprocess import PIPE
+from typing import Dict, List, Tuple
+
+from .utils import Path
+
+MAX_CONCURRENT_COMMANDS = 16
+POLICIES = ('prompt', 'warn', 'fail', 'ignore')
+
+GitInfo = Dict
+
+
+async def git_command(args: List[str], cwd: Path, semaphore) -> Tuple[int, str]:
+    async with semaphore:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'git', *args, cwd=cwd, stdout=PIPE, stderr=PIPE)
+        except OSError:  # missing folder
+            return -1, ""
+        output, _ = await process.communicate()
+    return process.returncode, output.decode()
+
+
+def parse_status(output: str) -> Dict:
+    # git status --porcelain=v2 --branch
+    info = {'branch': None, 'hash': None, 'changes': 0, 'untracked': 0}
+    for line in output.splitlines():
+        if line.startswith('# branch.oid '):
+            info['hash'] = line[len('# branch.oid '):]
+        elif line.startswith('# branch.head '):
+            head = line[len('# branch.head '):]
+            info['branch'] = 'HEAD' if head == '(detached)' else head
+        elif line[:2] in ('1 ', '2 ', 'u '):
+            info['changes'] += 1
+        elif line.startswith('? '):
+            info['untracked'] += 1
+    return info
+
+
+def parse_remotes(output: str) -> Dict[str, str]:
+    remotes = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == '(fetch)':
+            remotes[parts[0]] = parts[1]
+    return remotes
+
+
+async def path_info(path: Path, semaphore) -> GitInfo:
+    (status_code, status), (root_code, root), (_, remotes) = await asyncio.gather(
+        git_command(['status', '--porcelain=v2', '--branch'], path, semaphore),
+        git_command(['rev-parse', '--show-toplevel'], path, semaphore),
+        git_command(['remote', '-v'], path, semaphore),
+    )
+    if status_code != 0:
+        return {'path': path, 'git': False}
+    info = {'path': path, 'git': True, 'root': root.strip() if root_code == 0 else None}
+    info.update(parse_status(status))
+    info['remotes'] = parse_remotes(remotes)
+    return info
+
+
+async def paths_info(paths: [Path]) -> List[GitInfo]:
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_COMMANDS)
+    return await asyncio.gather(*(path_info(path, semaphore) for path in paths))
+
+
+def collect(paths: [Path]) -> Dict[Path, GitInfo]:
+    return {info['path']: info for info in asyncio.run(paths_info(paths))}
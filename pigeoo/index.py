@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional, Set
+
+from . import check
+from . import generator
+from . import query
+from . import recompute
+from .cache import DEFAULT_CACHE_PATH
+from .context import BuildContext
+from .utils import _logger, Path, deduplicate, normalize_paths
+
+Index = Dict
+
+
+def default_options(modules: Optional[List[str]] = None, options: Optional[Dict] = None) -> Dict:
+    # no git information: web links are not computed for library use
+    result = {
+        'local': True,
+        'hashes': {},
+        'versions': [],
+        'git_paths': [],
+        'modules': modules or [],
+        'cache_path': DEFAULT_CACHE_PATH,
+        'jobs': None,
+    }
+    result.update(options or {})
+    return result
+
+
+def models_index(class_list) -> Dict[str, list]:
+    models: Dict[str, list] = {}
+    for c in class_list:
+        name = query.get_class_name(c)
+        if name:
+            models.setdefault(name, []).append(c)
+    return models
+
+
+def index_classes(index: Index) -> Index:
+    # (re)computes the tables derived from classes_by_file, e.g. after a file changed
+    classes = generator.flatten_classes(index['all_models_files'], index['classes_by_file'])
+    index.update(
+        classes=classes,
+        models=models_index(classes),
+        symbols=check.build_symbol_index(classes),
+        graph=recompute.build_graph(classes),
+    )
+    return index
+
+
+def update_file_classes(index: Index, file_name: Path, classes: Optional[list]) -> Set[str]:
+    # replaces the classes of one file in classes and models, keeping the file order,
+    # and returns the models they concern; symbols and graph are left as built
+    order = {f: i for i, f in enumerate(index['all_models_files'])}
+    classes_by_file = index['classes_by_file']
+    position = sum(len(classes_by_file.get(f, [])) for f in index['all_models_files'][:order[file_name]])
+    old = classes_by_file.pop(file_name, [])
+    if classes is not None:
+        classes_by_file[file_name] = classes
+    index['classes'][position:position + len(old)] = classes or []
+
+    names = set()
+    for c in old:
+        name = query.get_class_name(c)
+        if name:
+            names.add(name)
+            index['models'][name] = [m for m in index['models'][name] if m is not c]
+    for c in classes or []:
+        name = query.get_class_name(c)
+        if name:
+            names.add(name)
+            models = index['models'].setdefault(name, [])
+            after = next((i for i, m in enumerate(models) if order[m['file']] > order[file_name]), len(models))
+            models.insert(after, c)
+    for name in names:
+        if not index['models'][name]:
+            del index['models'][name]
+    return names
+
+
+def make_index(paths: [Path], options: Dict, context, all_module_deps, all_models_files, classes_by_file) -> Index:
+    return index_classes({
+        'context': context,
+        'paths': paths,
+        'options': options,
+        'all_module_deps': all_module_deps,
+        'all_models_files': all_models_files,
+        'classes_by_file': classes_by_file,
+    })
+
+
+def build_index(paths: [Path], modules: Optional[List[str]] = None, options: Optional[Dict] = None) -> Index:
+    # discovery, manifests, parsing and dependencies, without rendering anything
+    options = default_options(modules, options)
+    paths = deduplicate(normalize_paths(paths))
+    context = BuildContext(paths)
+    all_module_deps = generator.generate_all_module_deps(paths, options, context)
+    all_models_files, classes_by_file = generator.parse_models(paths, all_module_deps, options, context)
+    _logger.info(f"Indexed {len(all_module_deps)} modules and {len(all_models_files)} files.")
+    return make_index(paths, options, context, all_module_deps, all_models_files, classes_by_file)
@@ -0,0 +1,324 @@
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+
+from . import check
+from . import generator
+from . import query
+from .index import Index, update_file_classes
+from .utils import _logger, Path
+
+RE_ENV_MODEL = r"""env\[\s*['"]([\w.]*)$"""
+RE_MODEL_STRING = r"""['"]([\w.]+)['"]"""
+RE_MEMBER = r'(\w+)\.(\w*)$'
+RE_DEF = r'\s*def\s+(\w+)\s*\('
+RE_CLASS = r'\s*class\s+\w+'
+RE_CLASS_MODEL = r"""\s*_(name|inherit)\s*=\s*\[?\s*['"]([\w.]+)['"]"""
+RE_SELF_LOOP = r'for\s+(\w+)\s+in\s+self\b'
+
+COMPLETION_FIELD = 5
+COMPLETION_METHOD = 2
+COMPLETION_MODULE = 9  # used for models
+
+Location = Dict
+
+
+def path_from_uri(uri: str) -> Path:
+    return os.path.realpath(unquote(urlparse(uri).path))
+
+
+def uri_from_path(path: Path) -> str:
+    return 'file://' + os.path.realpath(path)
+
+
+def location(file_name: Path, lineno: int) -> Location:
+    line = max(lineno - 1, 0)
+    position = {'line': line, 'character': 0}
+    return {'uri': uri_from_path(file_name), 'range': {'start': position, 'end': position}}
+
+
+class LanguageIndex:
+    # lookup tables over the model index, updated per file on save
+
+    def __init__(self, index: Index):
+        self.index = index
+        self.models: Dict[str, List[Tuple[Path, int, str]]] = {}
+        self.members: Dict[Tuple[str, str], List[Dict]] = {}
+        self.model_members: Dict[str, Set[str]] = {}
+        self.references: Dict[Tuple[str, str], List[Tuple[Path, int]]] = {}
+        self.accesses_by_file: Dict[Path, List] = {}
+        self.keys_by_file: Dict[Path, Set[Tuple[str, str]]] = {}
+        self.files = {os.path.realpath(f): f for f in index['all_models_files']}
+        self.visible: Dict[str, Dict[str, List[Dict]]] = {}
+        self.ancestries: Dict[str, Set[str]] = {}  # of the models in visible
+        for file_name, classes in index['classes_by_file'].items():
+            self.add_classes(classes)
+        self.parents = check.build_model_parents(index['classes'])
+        scans = check.scan_files(index['all_models_files'], index['options'])
+        for file_name, scan in scans.items():
+            self.add_accesses(file_name, scan['accesses'])
+
+    def add_classes(self, classes):
+        for c in classes:
+            model = query.get_class_name(c)
+            if not model:
+                continue
+            self.models.setdefault(model, []).append((c['file'], c['lineno'], c['module']))
+            keys = self.keys_by_file.setdefault(c['file'], set())
+            keys.add((model, None))
+            for kind in ('fields', 'functions'):
+                for name, values in c[kind].items():
+                    definition = {'file': c['file'], 'module': c['module'], 'kind': kind,
+                                  'lineno': values['lineno'], 'type': values.get('type')}
+                    self.members.setdefault((model, name), []).append(definition)
+                    self.model_members.setdefault(model, set()).add(name)
+                    keys.add((model, name))
+
+    def remove_file(self, file_name: Path):
+        for model, name in self.keys_by_file.pop(file_name, ()):
+            if name is None:
+                self.models[model] = [m for m in self.models[model] if m[0] != file_name]
+                if not self.models[model]:
+                    del self.models[model]
+                continue
+            self.members[(model, name)] = [d for d in self.members[(model, name)] if d['file'] != file_name]
+            if not self.members[(model, name)]:
+                del self.members[(model, name)]
+                self.model_members[model].discard(name)
+        for model, _, name, lineno in self.accesses_by_file.pop(file_name, []):
+            self.references[(model, name)].remove((file_name, lineno))
+
+    def add_accesses(self, file_name: Path, accesses):
+        self.accesses_by_file[file_name] = accesses
+        for model, _, name, lineno in accesses:
+            self.references.setdefault((model, name), []).append((file_name, lineno))
+
+    def update_file(self, path: Path):
+        file_name = self.files.get(path)
+        if not file_name:
+            return
+        self.remove_file(file_name)
+        # a file that no longer parses has no classes anymore
+        classes = generator.parse_models_files([file_name], self.index['options'], self.index['context'])
+        classes = classes.get(file_name)
+        names = update_file_classes(self.index, file_name, classes)
+        self.add_classes(classes or [])
+        scan = check.safe_scan_file(file_name)
+        self.add_accesses(file_name, scan['accesses'] if scan else [])
+        for name in names:
+            self.parents[name] = check.build_model_parents(self.index['models'].get(name, [])).get(name, set())
+        for model in [m for m, ancestry in self.ancestries.items() if ancestry & names]:
+            del self.visible[model], self.ancestries[model]
+        _logger.info(f"Updated {file_name}")
+
+    def visible_members(self, model: str) -> Dict[str, List[Dict]]:
+        if model not in self.visible:
+            visible: Dict[str, List[Dict]] = {}
+            ancestry = check.model_ancestry(model, self.parents)
+            for ancestor in ancestry:
+                for name in self.model_members.get(ancestor, ()):
+                    visible.setdefault(name, []).extend(self.members[(ancestor, name)])
+            self.visible[model] = visible
+            self.ancestries[model] = ancestry
+        return self.visible[model]
+
+
+def current_model(lines: List[str], line: int) -> Optional[str]:
+    start = next((i for i in range(min(line, len(lines) - 1), -1, -1)
+                  if re.match(RE_CLASS, lines[i])), None)
+    if start is None:
+        return None
+    found = {}
+    for text in lines[start + 1:]:
+        if re.match(RE_CLASS, text):
+            break
+        match = re.match(RE_CLASS_MODEL, text)
+        if match:
+            found.setdefault(match[1], match[2])
+    return found.get('name') or found.get('inherit')
+
+
+def word_at(text: str, character: int) -> Tuple[str, str]:
+    # (text before the word, whole word under the cursor), positions past the end are at the end
+    start = end = min(character, len(text))
+    while start > 0 and (text[start - 1].isalnum() or text[start - 1] in '_.'):
+        start -= 1
+    while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+        end += 1
+    return text[:start], text[start:end]
+
+
+class Server:
+
+    def __init__(self, index: Index, stdin=sys.stdin.buffer, stdout=sys.stdout.buffer):
+        self.language_index = LanguageIndex(index)
+        self.documents: Dict[str, List[str]] = {}
+        self.stdin = stdin
+        self.stdout = stdout
+        self.running = True
+
+    # protocol
+
+    def read_message(self) -> Optional[Dict]:
+        headers = {}
+        while True:
+            line = self.stdin.readline()
+            if not line:
+                return None
+            line = line.decode().strip()
+            if not line:
+                break
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+        return json.loads(self.stdin.read(int(headers['content-length'])))
+
+    def send(self, message: Dict):
+        body = json.dumps(message).encode()
+        self.stdout.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        self.stdout.flush()
+
+    def serve(self):
+        while self.running:
+            message = self.read_message()
+            if message is None:
+                break
+            self.handle(message)
+
+    def handle(self, message: Dict):
+        method = message.get('method', '')
+        handler = getattr(self, 'on_' + method.replace('/', '_').replace('$', '_'), None)
+        if 'id' not in message:  # notification
+            if handler:
+                handler(message.get('params', {}))
+            return
+        if not handler:
+            self.send({'jsonrpc': '2.0', 'id': message['id'],
+                       'error': {'code': -32601, 'message': f"Unknown method {method}"}})
+            return
+        try:
+            result = handler(message.get('params', {}))
+            self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+        except Exception as e:
+            _logger.exception(f"Handling {method}:")
+            self.send({'jsonrpc': '2.0', 'id': message['id'],
+                       'error': {'code': -32603, 'message': str(e)}})
+
+    # lifecycle and documents
+
+    def on_initialize(self, params):
+        return {'capabilities': {
+            'textDocumentSync': {'openClose': True, 'change': 1, 'save': True},
+            'definitionProvider': True,
+            'referencesProvider': True,
+            'hoverProvider': True,
+            'completionProvider': {'triggerCharacters': ['.', "'", '"']},
+        }}
+
+    def on_shutdown(self, params):
+        return None
+
+    def on_exit(self, params):
+        self.running = False
+
+    def on_textDocument_didOpen(self, params):
+        document = params['textDocument']
+        self.documents[document['uri']] = document['text'].splitlines()
+
+    def on_textDocument_didChange(self, params):
+        self.documents[params['textDocument']['uri']] = params['contentChanges'][-1]['text'].splitlines()
+
+    def on_textDocument_didClose(self, params):
+        self.documents.pop(params['textDocument']['uri'], None)
+
+    def on_textDocument_didSave(self, params):
+        self.language_index.update_file(path_from_uri(params['textDocument']['uri']))
+
+    # queries
+
+    def context(self, params) -> Dict:
+        uri = params['textDocument']['uri']
+        lines = self.documents.get(uri)
+        if lines is None:
+            with open(path_from_uri(uri), 'r') as f:
+                lines = f.read().splitlines()
+        line, character = params['position']['line'], params['position']['character']
+        text = lines[line] if line < len(lines) else ''
+        before, word = word_at(text, character)
+        model = current_model(lines, line)
+        receivers = {'self'} | set(re.findall(RE_SELF_LOOP, "\n".join(lines[:line + 1])))
+        context = {'model': model, 'text': text[:character], 'word': word, 'member': None, 'env_model': None,
+                   'receivers': receivers}
+
+        for match in re.finditer(RE_MODEL_STRING, text):
+            if match.start() <= character <= match.end() and match[1] in self.language_index.models:
+                context['env_model'] = match[1]
+                return context
+
+        member = re.search(RE_MEMBER, before + word)
+        if member and member[1] in receivers:
+            context['member'] = member[2]
+        elif re.match(RE_DEF, text) and re.match(RE_DEF, text)[1] == word:
+            context['member'] = word
+        return context
+
+    def member_definitions(self, model: Optional[str], name: Optional[str]) -> List[Dict]:
+        if not model or not name:
+            return []
+        return self.language_index.visible_members(model).get(name, [])
+
+    def on_textDocument_definition(self, params):
+        context = self.context(params)
+        if context['env_model']:
+            return [location(f, lineno) for f, lineno, _ in self.language_index.models.get(context['env_model'], [])]
+        definitions = self.member_definitions(context['model'], context['member'])
+        return [location(d['file'], d['lineno']) for d in definitions]
+
+    def on_textDocument_references(self, params):
+        context = self.context(params)
+        model, name = context['model'], context['member']
+        if not model or not name:
+            return []
+        locations = [location(d['file'], d['lineno']) for d in self.member_definitions(model, name)]
+        for ancestor in check.model_ancestry(model, self.language_index.parents):
+            locations += [location(f, lineno) for f, lineno
+                          in self.language_index.references.get((ancestor, name), [])]
+        return locations
+
+    def on_textDocument_hover(self, params):
+        context = self.context(params)
+        if context['env_model']:
+            modules = sorted({m for _, _, m in self.language_index.models.get(context['env_model'], [])})
+            value = f"**{context['env_model']}**\n\nDefined in: {', '.join(modules)}"
+        else:
+            definitions = self.member_definitions(context['model'], context['member'])
+            if not definitions:
+                return None
+            kind = "field" if definitions[0]['kind'] == 'fields' else "method"
+            types = sorted({d['type'] for d in definitions if d['type']})
+            value = f"**{context['member']}** ({kind}{': ' + ', '.join(types) if types else ''})\n\n"
+            value += "Defined in: " + ", ".join(sorted({d['module'] for d in definitions}))
+        return {'contents': {'kind': 'markdown', 'value': value}}
+
+    def on_textDocument_completion(self, params):
+        context = self.context(params)
+        if re.search(RE_ENV_MODEL, context['text']):
+            prefix = re.search(RE_ENV_MODEL, context['text'])[1]
+            return [{'label': m, 'kind': COMPLETION_MODULE}
+                    for m in sorted(self.language_index.models) if m.startswith(prefix)]
+        member = re.search(RE_MEMBER, context['text'])
+        if not context['model'] or not member or member[1] not in context['receivers']:
+            return []  # only self and the records looped over in self are known to be of the model
+        items = []
+        for name, definitions in sorted(self.language_index.visible_members(context['model']).items()):
+            if name.startswith(member[2]):
+                kind = COMPLETION_FIELD if definitions[0]['kind'] == 'fields' else COMPLETION_METHOD
+                items.append({'label': name, 'kind': kind, 'detail': definitions[0]['type'] or ''})
+        return items
+
+
+def main(index: Index):
+    _logger.info("Starting language server.")
+    Server(index).serve()
@@ -2,12 +2,23 @@
 
 import os
 import subprocess
+import sys
+from typing import Dict
 
 import click
 from configargparse import ArgumentParser
 
+from . import compress
 from . import generator
-from .utils import Path, _logger
+from . import gitinfo
+from . import lsp
+from . import serve
+from . import shard
+from .index import build_index
+from . import watch
+from .cache import DEFAULT_CACHE_PATH
+from .context import BuildContext
+from .utils import Path, _logger, deduplicate, normalize_paths
 
 PATHS = [
     "~/src/odoo/",
@@ -15,10 +26,11 @@ PATHS = [
 ]
 
 
-def main_arguments_parser():
-    def str2bool(v):
-        return str(v).lower() in ('yes', 'true', 't', 'y', '1')
+def str2bool(v):
+    return str(v).lower() in ('yes', 'true', 't', 'y', '1')
+
 
+def main_arguments_parser():
     parser = ArgumentParser(description='Pigeoo', default_config_files=['./pigeoo.rc', '~/.pigeoo.rc'])  # TODO: use standard config file?
     parser.add('-c', '--config', is_config_file=True, help='config file path')
 
@@ -33,45 +45,69 @@ def main_arguments_parser():
                         default=True, help='If run in local mode, documentation contains links to files.')
     parser.add_argument('--modules', '-m', type=str, nargs='?',
                         default=[], help='If set, restrict the modules to their dependencies.')
+    parser.add_argument('--check', type=str2bool, nargs='?', const=True,
+                        default=False, help='Check field and method references against module dependencies.')
+    parser.add_argument('--cache_path', type=str, nargs='?',
+                        default=DEFAULT_CACHE_PATH, help='Folder for cached parse results.')
+    parser.add_argument('--jobs', '-j', type=int, nargs='?',
+                        default=None, help='Number of parallel workers (defaults to the number of CPUs).')
+    parser.add_argument('--git_policy', type=str, nargs='?', choices=gitinfo.POLICIES,
+                        default='prompt', help='What to do with unclean git paths '
+                        '(prompt falls back to warn when not run interactively).')
+    parser.add_argument('--lazy_threshold', type=int, nargs='?',
+                        default=generator.LAZY_TREE_THRESHOLD,
+                        help='Module pages with more modules in their trees load their levels on demand.')
+    parser.add_argument('--compress', type=str, nargs='?',
+                        default='', help='Comma separated encodings (gz,br) of compressed copies of the output files.')
+    parser.add_argument('--bundle', type=str2bool, nargs='?', const=True,
+                        default=False, help='Also package the documentation in a zip next to the output folder.')
+    parser.add_argument('--watch', '-w', type=str2bool, nargs='?', const=True,
+                        default=False, help='Keep running and update the documentation on file changes.')
 
     return parser
 
 
-def deduplicate(seq):
-   uniques = []
-   [uniques.append(i) for i in seq if not uniques.count(i)]
-   return uniques
-
-
-def normalize_paths(paths: [Path]) -> [Path]:
-    normalized_paths = []
-    for path in paths:
-        if os.path.split(path.rstrip("/"))[-1] == 'odoo':
-            normalized_paths.append(os.path.join(path, 'addons/'))
-            normalized_paths.append(os.path.join(path, 'odoo/addons/'))
-        else:
-            normalized_paths.append(path)
-    return [os.path.expanduser(path) for path in normalized_paths]
+def diff_arguments_parser():
+    parser = ArgumentParser(prog='pigeoo diff', description='Compare two generated documentations.')
+    parser.add_argument('old_path', type=str, help='Output folder of the old version.')
+    parser.add_argument('new_path', type=str, help='Output folder of the new version.')
+    parser.add_argument('--output_path', '-o', type=str, nargs='?',
+                        help='Output folder for the diff report.')
+    return parser
 
 
-def git_check_clean_paths(paths: [Path]):
-    for path in paths:
-        status = subprocess.check_output(['git', 'status'], cwd=path).decode()
-        branch_name = status.splitlines()[0][len("On branch "):]
-        _logger.info(f"Path {path} on branch {branch_name}.")
-        if 'changes' in status.lower():
-            _logger.exception("You should first clean up path:" + path + "  \n"
-                              "Line numbers might be incorrect, etc.")
-            if click.confirm("Do you want to clean up with `git clean -fdx`?\n", default=False):
-                subprocess.check_output(['git', 'clean', '-fdx'], cwd=path)
-            else:
-                _logger.info("Continuing with unclean paths.")
+def git_check_clean_paths(git_infos: Dict[Path, Dict], policy: str):
+    if policy == 'prompt' and not sys.stdin.isatty():
+        policy = 'warn'  # nobody to answer
+    unclean = []
+    for path, info in git_infos.items():
+        _logger.info(f"Path {path} on branch {info['branch']}.")
+        if info['changes'] and policy != 'ignore':
+            unclean.append(path)
+            _logger.warning("You should first clean up path:" + path + "  \n"
+                            "Line numbers might be incorrect, etc.")
+            if policy == 'prompt':
+                if click.confirm("Do you want to clean up with `git clean -fdx`?\n", default=False):
+                    subprocess.check_output(['git', 'clean', '-fdx'], cwd=path)
+                else:
+                    _logger.info("Continuing with unclean paths.")
+    if unclean and policy == 'fail':
+        raise Exception("Unclean paths: " + ", ".join(unclean))
 
 
-def git_get_version(path: Path, hash=False) -> str:
-    args = (['git', 'rev-parse', '--abbrev-ref', 'HEAD']
-            if not hash else ['git', 'rev-parse', 'HEAD'])
-    return subprocess.check_output(args, cwd=path).decode().strip()
+def git_options(paths: [Path], policy: str) -> Dict:
+    git_infos = {p: info for p, info in gitinfo.collect(paths).items() if info['git']}
+    git_paths = [path for path in paths if path in git_infos]
+    git_check_clean_paths(git_infos, policy)
+    return {
+        'hashes': {path: git_infos[path]['hash'] for path in git_paths},
+        'versions': deduplicate(git_infos[path]['branch'] for path in git_paths),
+        'git_paths': git_paths,
+        'remotes': {
+            info['root']: info['remotes']['origin'] for info in git_infos.values()
+            if info['root'] and 'origin' in info['remotes']
+        },
+    }
 
 
 def default_output_path(options):
@@ -88,36 +124,150 @@ def find_latest_version() -> str:
     return directories[-1]
 
 
-def filter_git_paths(paths: [Path]) -> [Path]:
-    git_paths = []
-    for path in paths:
-        try:
-            subprocess.check_output(['git', 'status'], cwd=path).decode()
-            git_paths.append(path)
-        except subprocess.CalledProcessError:
-            pass  # that's fine
-    return git_paths
+def lsp_arguments_parser():
+    parser = ArgumentParser(prog='pigeoo lsp', description='Language server over stdio.',
+                            default_config_files=['./pigeoo.rc', '~/.pigeoo.rc'], ignore_unknown_config_file_keys=True)
+    parser.add('-c', '--config', is_config_file=True, help='config file path')
+    parser.add_argument('--paths', '-p', type=str, nargs='?',
+                        default=PATHS, help='Comma separated list of paths.')
+    parser.add_argument('--modules', '-m', type=str, nargs='?',
+                        default=[], help='If set, restrict the modules to their dependencies.')
+    parser.add_argument('--cache_path', type=str, nargs='?',
+                        default=DEFAULT_CACHE_PATH, help='Folder for cached parse results.')
+    return parser
+
+
+def main_lsp(argv):
+    args = lsp_arguments_parser().parse_args(argv)
+    paths = args.paths.split(',') if isinstance(args.paths, str) else PATHS
+    modules = args.modules.split(',') if isinstance(args.modules, str) else []
+    index = build_index(paths, modules=modules, options={'cache_path': args.cache_path})
+    lsp.main(index)
+
+
+def map_arguments_parser():
+    parser = ArgumentParser(prog='pigeoo map', description='Parse some modules into an artifact for pigeoo merge.')
+    parser.add_argument('--paths', '-p', type=str, nargs='?',
+                        default=PATHS, help='Comma separated list of paths.')
+    parser.add_argument('--modules', '-m', type=str, nargs='?',
+                        default=[], help='If set, only map these modules.')
+    parser.add_argument('--shard', type=str, nargs='?',
+                        help='index/count: only map every count-th module, starting at index.')
+    parser.add_argument('--output', '-o', type=str, required=True, help='Artifact file.')
+    parser.add_argument('--check', type=str2bool, nargs='?', const=True,
+                        default=False, help='Also scan the files for pigeoo merge --check.')
+    parser.add_argument('--cache_path', type=str, nargs='?',
+                        default=DEFAULT_CACHE_PATH, help='Folder for cached parse results.')
+    parser.add_argument('--jobs', '-j', type=int, nargs='?',
+                        default=None, help='Number of parallel workers (defaults to the number of CPUs).')
+    parser.add_argument('--git_policy', type=str, nargs='?', choices=gitinfo.POLICIES,
+                        default='warn', help='What to do with unclean git paths.')
+    return parser
+
+
+def merge_arguments_parser():
+    parser = ArgumentParser(prog='pigeoo merge', description='Render the documentation from pigeoo map artifacts.')
+    parser.add_argument('artifacts', type=str, nargs='+', help='Artifact files.')
+    parser.add_argument('--output_path', '-o', type=str, nargs='?',
+                        help='Folder for the documentation.')
+    parser.add_argument('--local', '-l', type=str2bool, nargs='?', const=True,
+                        default=True, help='If run in local mode, documentation contains links to files.')
+    parser.add_argument('--modules', '-m', type=str, nargs='?',
+                        default=[], help='If set, restrict the modules to their dependencies.')
+    parser.add_argument('--check', type=str2bool, nargs='?', const=True,
+                        default=False, help='Check references (artifacts mapped with --check).')
+    parser.add_argument('--lazy_threshold', type=int, nargs='?',
+                        default=generator.LAZY_TREE_THRESHOLD,
+                        help='Module pages with more modules in their trees load their levels on demand.')
+    parser.add_argument('--compress', type=str, nargs='?',
+                        default='', help='Comma separated encodings (gz,br) of compressed copies of the output files.')
+    parser.add_argument('--bundle', type=str2bool, nargs='?', const=True,
+                        default=False, help='Also package the documentation in a zip next to the output folder.')
+    return parser
+
+
+def serve_arguments_parser():
+    parser = ArgumentParser(prog='pigeoo serve', description='Serve a documentation folder or zip bundle.')
+    parser.add_argument('path', type=str, nargs='?', help='Documentation folder or zip (defaults to the latest one).')
+    parser.add_argument('--host', type=str, default=serve.DEFAULT_HOST,
+                        help='Address to listen on (0.0.0.0 for every interface).')
+    parser.add_argument('--port', type=int, default=serve.DEFAULT_PORT, help='Port to listen on.')
+    return parser
+
+
+def split_encodings(encodings: str) -> [str]:
+    result = [e.strip() for e in encodings.split(',') if e.strip()]
+    for encoding in result:
+        if encoding not in compress.ENCODINGS:
+            raise Exception(f"Unknown encoding {encoding}, use some of {', '.join(compress.ENCODINGS)}.")
+    return result
+
+
+def main_map(argv):
+    args = map_arguments_parser().parse_args(argv)
+    paths = args.paths.split(',') if isinstance(args.paths, str) else PATHS
+    paths = deduplicate(normalize_paths(paths))
+    modules = args.modules.split(',') if isinstance(args.modules, str) else None
+    options = git_options(paths, args.git_policy)
+    options.update(check=args.check, cache_path=args.cache_path, jobs=args.jobs)
+    context = BuildContext(paths)
+    artifact = generator.map_stage(paths, options, context, modules, args.shard)
+    shard.write_artifact(artifact, args.output)
+    _logger.info(f"Mapped {len(artifact['modules'])} modules to {args.output}")
+
+
+def main_merge(argv):
+    args = merge_arguments_parser().parse_args(argv)
+    artifacts = [shard.load_artifact(a) for a in args.artifacts]
+    modules = args.modules.split(',') if isinstance(args.modules, str) else []
+    options = shard.merged_options(artifacts, {
+        'local': args.local, 'modules': modules, 'check': args.check, 'lazy_threshold': args.lazy_threshold,
+        'compress': split_encodings(args.compress), 'bundle': args.bundle})
+    output_path = args.output_path or default_output_path(options)
+    generator.merge_stage(artifacts, output_path, options)
+
+
+def main_serve(argv):
+    args = serve_arguments_parser().parse_args(argv)
+    serve.main(args.path or find_latest_version(), args.port, args.host)
+
+
+def main_diff(argv):
+    args = diff_arguments_parser().parse_args(argv)
+    old_name = os.path.basename(args.old_path.rstrip('/'))
+    new_name = os.path.basename(args.new_path.rstrip('/'))
+    output_path = args.output_path or f"diff_{old_name}_{new_name}"
+    generator.main_diff(args.old_path, args.new_path, output_path)
 
 
 def main():
+    if sys.argv[1:2] == ['diff']:
+        return main_diff(sys.argv[2:])
+    if sys.argv[1:2] == ['lsp']:
+        return main_lsp(sys.argv[2:])
+    if sys.argv[1:2] == ['map']:
+        return main_map(sys.argv[2:])
+    if sys.argv[1:2] == ['merge']:
+        return main_merge(sys.argv[2:])
+    if sys.argv[1:2] == ['serve']:
+        return main_serve(sys.argv[2:])
     args = main_arguments_parser().parse_args()
     if args.generate:
         # TODO: autodetect venv path, etc (project mode)
         paths = args.paths.split(',') if isinstance(args.paths, str) else PATHS
         paths = deduplicate(normalize_paths(paths))
-        git_paths = filter_git_paths(paths)
-        git_check_clean_paths(git_paths)
-
-        versions = deduplicate(git_get_version(path) for path in git_paths)
-        hashes = {path: git_get_version(path, hash=True) for path in git_paths}
-
-        options = {'local': args.local, 'hashes': hashes, 'versions': versions}
-        options["git_paths"] = git_paths
+        options = {'local': args.local}
+        options.update(git_options(paths, args.git_policy))
         modules = args.modules.split(',') if isinstance(args.modules, str) else []
         options["modules"] = modules
+        options.update(check=args.check, cache_path=args.cache_path, jobs=args.jobs,
+                       lazy_threshold=args.lazy_threshold, compress=split_encodings(args.compress),
+                       bundle=args.bundle)
         output_path = args.output_path or default_output_path(options)
 
-        generator.main(paths, output_path, options)
+        state = generator.main(paths, output_path, options)
+        if args.watch:
+            watch.main(state)
 
 
 if __name__ == "__main__":
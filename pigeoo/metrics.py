@@ -0,0 +1,101 @@
+import csv
+import io
+from array import array
+from typing import Dict, List
+
+from . import query
+
+try:
+    import numpy  # type: ignore
+except ImportError:
+    numpy = None
+
+COLUMNS = (
+    'model',
+    'extending_modules',
+    'fields',
+    'methods',
+    'overridden_methods',
+    'override_depth',
+    'many2one_fan_out',
+    'many2one_fan_in',
+)
+
+Metrics = List[Dict]
+
+
+def bincount(indexes: array, size: int, weights: array = None) -> List[int]:
+    if numpy is not None:
+        counts = numpy.bincount(numpy.frombuffer(indexes, dtype=numpy.int64), minlength=size,
+                                weights=None if weights is None else numpy.frombuffer(weights, dtype=numpy.int64))
+        return counts.astype(numpy.int64).tolist()
+    counts = [0] * size
+    if weights is None:
+        for i in indexes:
+            counts[i] += 1
+    else:
+        for i, w in zip(indexes, weights):
+            counts[i] += w
+    return counts
+
+
+def maximum(indexes: array, values: array, size: int) -> List[int]:
+    if numpy is not None:
+        result = numpy.zeros(size, dtype=numpy.int64)
+        numpy.maximum.at(result, numpy.frombuffer(indexes, dtype=numpy.int64),
+                         numpy.frombuffer(values, dtype=numpy.int64))
+        return result.tolist()
+    result = [0] * size
+    for i, v in zip(indexes, values):
+        if v > result[i]:
+            result[i] = v
+    return result
+
+
+def index_table(entities: Dict, models: Dict[str, int]):
+    # one row per (name, model) aggregate: model index and number of defining modules
+    model_ids, counts = array('q'), array('q')
+    for (_, model), definitions in entities.items():
+        model_ids.append(models[model])
+        counts.append(len(definitions))
+    return model_ids, counts
+
+
+def compute_metrics(class_list) -> Metrics:
+    all_fields = query.get_all_fields(class_list)
+    all_functions = query.get_all_functions(class_list)
+    names = sorted({query.get_class_name(c) for c in class_list} - {None})
+    models = {name: i for i, name in enumerate(names)}
+    size = len(names)
+
+    extensions = {(query.get_class_name(c), c['module']) for c in class_list if query.get_class_name(c)}
+    extending = bincount(array('q', (models[m] for m, _ in extensions)), size)
+
+    field_models, _ = index_table(all_fields, models)
+    fields = bincount(field_models, size)
+
+    function_models, definitions = index_table(all_functions, models)
+    methods = bincount(function_models, size)
+    overridden = bincount(function_models, size, array('q', (int(d > 1) for d in definitions)))
+    depth = maximum(function_models, definitions, size)
+
+    sources, targets = array('q'), array('q')
+    for model, model_fields in query.get_model_fields(class_list).items():
+        for field in model_fields.values():
+            if field.get('type') == 'Many2one' and field.get('comodel_name') in models:
+                sources.append(models[model])
+                targets.append(models[field['comodel_name']])
+    fan_out = bincount(sources, size)
+    fan_in = bincount(targets, size)
+
+    rows = [dict(zip(COLUMNS, values)) for values in
+            zip(names, extending, fields, methods, overridden, depth, fan_out, fan_in)]
+    return sorted(rows, key=lambda r: (-r['extending_modules'], -r['override_depth'], r['model']))
+
+
+def metrics_to_csv(metrics: Metrics) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(metrics)
+    return output.getvalue()
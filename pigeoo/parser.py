@@ -5,6 +5,7 @@ from typing import List, Dict, Optional
 from subprocess import Popen, PIPE
 
 from . import query
+from . import records
 from .utils import _logger, Path
 
 MODEL_FOLDERS = ["models", "components", "wizard", "wizards", "datamodels"]  # TODO: nonstandard
@@ -29,6 +30,17 @@ special_attributes_con = ('_constraints',)
 special_attributes_sql = ('_sql_constraints',)
 special_attributes_bool = ('_auto', '_parent_store',)
 
+field_attributes = (
+    'index',
+    'store',
+    'compute',
+    'related',
+    'required',
+    'comodel_name',
+)
+relational_field_types = ('Many2one', 'One2many', 'Many2many')
+function_decorators = ('depends', 'depends_context')
+
 special_attributes = (special_attributes_str +
                       special_attributes_con +
                       special_attributes_sql +
@@ -37,15 +49,6 @@ special_attributes = (special_attributes_str +
                       special_attributes_bool)
 
 
-def memoize_first(f):
-    memo = {}
-    def helper(x, *args, **kwargs):
-        if x not in memo:
-            memo[x] = f(x, *args, **kwargs)
-        return memo[x]
-    return helper
-
-
 def all_classes(a):
     return [node for node in a.body if isinstance(node, ast.ClassDef)]
 
@@ -71,11 +74,28 @@ def parse_value_bool(v):
     return v.value
 
 
+def parse_value_literal(v):
+    if isinstance(v, ast.Constant):
+        return v.value
+    elif isinstance(v, ast.Name):  # compute=_compute_method
+        return v.id
+    return None
+
+
 def parse_value_field(v):
     value = {
         'type': v.func.attr,
         'lineno': v.lineno,
     }
+    if value['type'] in relational_field_types and v.args:
+        comodel_name = parse_value_literal(v.args[0])
+        if isinstance(comodel_name, str):
+            value['comodel_name'] = comodel_name
+    for keyword in v.keywords:
+        if keyword.arg in field_attributes:
+            attribute = parse_value_literal(keyword.value)
+            if attribute is not None:
+                value[keyword.arg] = attribute
     return value
 
 
@@ -162,13 +182,23 @@ def is_assign_bool(a_a):
     return is_assign_x(a_a, special_attributes_bool)
 
 
+def parse_function_decorators(a_a):
+    decorators = {}
+    for decorator in a_a.decorator_list:
+        if (isinstance(decorator, ast.Call) and 'attr' in dir(decorator.func)
+                and decorator.func.attr in function_decorators):
+            args = [parse_value_literal(arg) for arg in decorator.args]
+            decorators[decorator.func.attr] = [a for a in args if isinstance(a, str)]
+    return decorators
+
+
 def parse_class_function(a_a):
     # TODO: kwargs and such
     values = {
         'lineno': a_a.lineno,
-        # 'decorator_list': a_a.decorator_list,
         'args': [v.arg for v in a_a.args.args],
     }
+    values.update(parse_function_decorators(a_a))
     return a_a.name, values
 
 
@@ -208,37 +238,53 @@ def parse_odoo_class(a_c, class_dict):
     return class_dict
 
 
-def parse_model_file(module_name, file_name):
+def parse_model_file(module_name, file_name, files: records.FileTable):
     file_content = open(file_name, 'r').read()
     a = ast.parse(file_content)
     classes = all_classes(a)
+    file_id = files.add(module_name, file_name)
     result = []
     for odoo_class in classes:
         class_dict = {
-            'module': module_name,
-            'file': file_name,
-            'full path': os.path.realpath(file_name),
             'lineno': odoo_class.lineno,
         }
         parse_odoo_class(odoo_class, class_dict)
-        result.append(class_dict)
+        result.append(records.ClassRecord(files, file_id, class_dict))
     return result
 
 
-def models_files_from_modules(module_list):
-    def is_base_module(module):
-        return re.match('.*base.?$', module)
+def is_base_module(module):
+    return re.match('.*base.?$', module)
 
-    def get_module_paths(module):
-        if is_base_module(module):
-            return [module]
-        else:
-            module_folders = [os.path.join(module, subfolder) for subfolder in MODEL_FOLDERS]
-            return [folder for folder in module_folders if os.path.exists(folder)]
 
+def module_models_paths(module):
+    if is_base_module(module):
+        return [module]
+    else:
+        module_folders = [os.path.join(module, subfolder) for subfolder in MODEL_FOLDERS]
+        return [folder for folder in module_folders if os.path.exists(folder)]
+
+
+PARSE_FORMAT = "2"  # cache version of the values below, to bump when they change
+
+
+def parse_model_file_values(module_name, file_name):
+    # path independent values of the classes, to be cached or sent across processes
+    return [
+        {k: v for k, v in c.to_dict().items() if k not in records.ClassRecord.derived_keys}
+        for c in parse_model_file(module_name, file_name, records.FileTable())
+    ]
+
+
+def models_from_file_values(module_name, file_name, values, files: records.FileTable):
+    file_id = files.add(module_name, file_name)
+    return [records.ClassRecord(files, file_id, v) for v in values]
+
+
+def models_files_from_modules(module_list):
     files_list = []
     for module in module_list:
-        for module_path in get_module_paths(module):
+        for module_path in module_models_paths(module):
             for (base_path, _, file_names) in os.walk(module_path):
                 for file_name in file_names:
                     file_path = os.path.join(base_path, file_name)
@@ -277,7 +323,10 @@ def modules_from_paths(path_list: [Path], all_module_depths=None) -> [Path]:
     return module_list
 
 
-def module_path_from_name(name: str, paths: [Path]) -> Path:
+def module_path_from_name(name: str, paths: [Path], context=None) -> Path:
+    if context is not None:
+        return context.cache('module_path').memoize(
+            (name, tuple(paths)), lambda: module_path_from_name(name, paths))
     # check for the manifest as some module move from enterprise to community
     for path in paths:
         module_path = os.path.join(path, name)
@@ -287,24 +336,39 @@ def module_path_from_name(name: str, paths: [Path]) -> Path:
                     "Wrong name or missing path?" % name)
 
 
-@memoize_first
-def module_dependencies_tree(module_path, paths):
+def module_dependencies_tree(module_path, paths, context):
+    key = (module_path, tuple(paths))
+    return context.cache('dependencies_tree').memoize(
+        key, lambda: _module_dependencies_tree(module_path, paths, context))
+
+
+def _module_dependencies_tree(module_path, paths, context):
     if module_name_from_path(module_path) == 'base':
         return {}
-    manifest_file = os.path.join(module_path, '__manifest__.py')
-    if not os.path.exists(manifest_file):
-        module_path = module_path_from_name(module_path, paths)
-        manifest_file = os.path.join(module_path, '__manifest__.py')
-    if not os.path.exists(manifest_file):
-        _logger.exception("Module without a manifest: " + module_path)
+    manifest_dict = module_manifest(module_path, paths, context)
+    if manifest_dict is None:
         return {}
-    manifest_dict = eval(open(manifest_file, 'r').read())
     dependencies = manifest_dict.get('depends', ['base'])
-    modules = [module_path_from_name(dep, paths) for dep in dependencies]
-    all_trees = {module_name_from_path(m): module_dependencies_tree(m, paths) for m in modules}
+    modules = [module_path_from_name(dep, paths, context) for dep in dependencies]
+    all_trees = {module_name_from_path(m): module_dependencies_tree(m, paths, context) for m in modules}
     return all_trees
 
 
+def module_manifest(module_path, paths, context) -> Optional[Dict]:
+    # module_path may also be a module name
+    if os.sep not in module_path:
+        module_path = module_path_from_name(module_path, paths, context)
+    return context.cache('manifests').memoize(module_path, lambda: read_manifest(module_path))
+
+
+def read_manifest(module_path: Path) -> Optional[Dict]:
+    manifest_file = os.path.join(module_path, '__manifest__.py')
+    if not os.path.exists(manifest_file):
+        _logger.exception("Module without a manifest: " + module_path)
+        return None
+    return eval(open(manifest_file, 'r').read())
+
+
 def dict_depth(d):
     # awful algorithm, but the recursive dict_depth is way too inefficient
     depth = 0
@@ -335,73 +399,85 @@ def dict_flatten(d, keys=None):
     return keys
 
 
-@memoize_first
-def module_dependencies_depth(module_path: Path, paths: [Path]) -> int:
-    if module_name_from_path(module_path) == 'base':
-        return 0
-    dependency_tree = module_dependencies_tree(module_path, paths)
-    return dict_depth(dependency_tree)
+def module_dependencies_depth(module_path: Path, paths: [Path], context) -> int:
+    def depth():
+        if module_name_from_path(module_path) == 'base':
+            return 0
+        dependency_tree = module_dependencies_tree(module_path, paths, context)
+        return dict_depth(dependency_tree)
+    return context.cache('dependencies_depth').memoize((module_path, tuple(paths)), depth)
 
 
-@memoize_first
-def module_flat_dependencies(module_name, dependency_tree) -> List[str]:
-    return dict_flatten(dependency_tree)
+def module_flat_dependencies(module_name, dependency_tree, paths, context) -> List[str]:
+    # the tree is derived from the paths, which are part of the key
+    return context.cache('flat_dependencies').memoize(
+        (module_name, tuple(paths)), lambda: dict_flatten(dependency_tree))
 
 
-def invert_dependencies(name, dependency_tree, paths) -> DepTree:
+def invert_dependencies(name, dependency_tree, paths, context) -> DepTree:
     if dependency_tree == {}:
         return []
-    all_deps = module_flat_dependencies(name, dependency_tree)
-    module_depths = {m: module_dependencies_depth(m, paths) for m in all_deps}
+    all_deps = module_flat_dependencies(name, dependency_tree, paths, context)
+    module_depths = {m: module_dependencies_depth(m, paths, context) for m in all_deps}
     inverted_tree:DepTree = [[] for i in range(max(module_depths.values()) + 1)]
     for m, d in module_depths.items():
         inverted_tree[d].append(m)
     return inverted_tree
 
 
-def dep_tree_enrich(dep_tree: DepTree, paths:[Path], options: Dict) -> InfoDepTree:
+def dep_tree_enrich(dep_tree: DepTree, paths:[Path], options: Dict, context) -> InfoDepTree:
     infos = []
     for level in dep_tree:
         info_level = []
         for module in level:
-            path = module_path_from_name(module, paths)
-            module_info = {'name': module,'path': path, 'link': web_link(path, options)}
+            path = module_path_from_name(module, paths, context)
+            module_info = {'name': module,'path': path, 'link': web_link(path, options, context)}
             info_level.append(module_info)
         infos.append(info_level)
     return infos
 
 
-def class_tree(class_name, class_list, paths, github_root, all_module_deps):
+def class_tree(class_name, class_list, paths, github_root, all_module_deps, context):
     classes = query.get_class(class_name, class_list)
     modules = set(c['module'] for c in classes)
     tree = query.treeify_modules(modules, all_module_deps)
 
-    infos = dep_tree_enrich(tree, paths, github_root)
+    infos = dep_tree_enrich(tree, paths, github_root, context)
     class_tree = [[c for c in classes if c['module'] in level] for level in tree]
 
     return infos, class_tree
 
 
-def git_repository_folder_from_filename(file_name: Path, memo:[Path]=[]) -> str:
-    for repository in memo:
-        if repository in file_name:
-            return repository
-
+def git_repository_folder_from_filename(file_name: Path, context) -> str:
+    cache = context.cache('git_repository_folder')
     dir_name = os.path.dirname(file_name)
+    repository = None
+    visited = []
     while dir_name != '/':
+        repository = cache.get(dir_name)
+        if repository:
+            break
+        visited.append(dir_name)
         if os.path.exists(os.path.join(dir_name, '.git')):
-            memo.append(dir_name)
-            return dir_name
+            repository = dir_name
+            break
         else:
             dir_name = os.path.abspath(os.path.join(dir_name, os.pardir))
-    _logger.exception("Could not find the repository. Online links will be wrong.")
-    return "repository"
+    if not repository:
+        _logger.exception("Could not find the repository. Online links will be wrong.")
+        repository = "repository"
+    for folder in visited:
+        cache.set(folder, repository)
+    return repository
+
+
+def git_repository_folder_to_remote(repository_folder: Path, context) -> str:
+    return context.cache('git_remote').memoize(
+        repository_folder, lambda: _git_repository_folder_to_remote(repository_folder))
 
 
-def git_repository_folder_to_remote(repository_folder: Path, memo:Dict[Path, str]={}) -> str:
+def _git_repository_folder_to_remote(repository_folder: Path) -> str:
     # toclean
-    if repository_folder in memo:
-        return memo[repository_folder]
     try:
         output, err = Popen(['git', 'remote', '-v'], cwd=repository_folder, stdout=PIPE, stderr=PIPE).communicate()
         lines = output.decode().split("\n")
@@ -410,16 +486,13 @@ def git_repository_folder_to_remote(repository_folder: Path, memo:Dict[Path, str
             fetch_tag = " (fetch)"
             if line.startswith(origin_tag) and line.endswith(fetch_tag):
                 remote = line[len(origin_tag):-len(fetch_tag)]
-                memo[repository_folder] = remote
                 return remote
     except KeyboardInterrupt:
         exit()
     except Exception as e:
         _logger.exception(f"Error finding git remote: {e}")
     _logger.exception(f"No origin found for {repository_folder}")
-    remote = "unknown"
-    memo[repository_folder] = remote
-    return remote
+    return "unknown"
 
 
 def git_to_https(repository: str) -> str:
@@ -429,11 +502,15 @@ def git_to_https(repository: str) -> str:
         return repository
 
 
-def web_link(file_name:Path, options: Dict) -> Optional[str]:
+def web_link(file_name: Path, options: Dict, context) -> Optional[str]:
+    return context.cache('web_link').memoize(file_name, lambda: _web_link(file_name, options, context))
+
+
+def _web_link(file_name:Path, options: Dict, context) -> Optional[str]:
     if not any(p in file_name for p in options['git_paths']):
         return None
-    repository_path = git_repository_folder_from_filename(file_name)
-    repository = git_to_https(git_repository_folder_to_remote(repository_path))
+    repository_path = git_repository_folder_from_filename(file_name, context)
+    repository = git_to_https(git_repository_folder_to_remote(repository_path, context))
     hash = ""
     for key in options['hashes']:
         if repository_path in key:
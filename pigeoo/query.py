@@ -20,6 +20,13 @@ def get_class(class_name, class_list):
     return [c for c in class_list if get_class_name(c) == class_name]
 
 
+def get_classes_by_name(class_list):
+    classes_by_name = {}
+    for c in class_list:
+        classes_by_name.setdefault(get_class_name(c), []).append(c)
+    return classes_by_name
+
+
 def get_depending_modules(mod_name, all_modules) -> [str]:  # -> [module_names]
     return {m for m in all_modules if module_m_depends_on_n(m, mod_name, all_modules)}
 
@@ -57,3 +64,14 @@ def get_all_entities(entity, class_list):
                 all_entities.setdefault(key, {})
                 all_entities[key][c["module"]] = c[entity][function]
     return all_entities
+
+
+def get_model_fields(class_list):
+    # attributes of overriding definitions are added to the original ones
+    models = {}
+    for (field, model), definitions in get_all_fields(class_list).items():
+        merged = {'modules': sorted(definitions)}
+        for definition in definitions.values():
+            merged.update({k: v for k, v in definition.items() if k != 'lineno'})
+        models.setdefault(model, {})[field] = merged
+    return models
@@ -0,0 +1,205 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import query
+from .parser import relational_field_types
+
+Node = Tuple[str, str]  # (model, field)
+Graph = Dict
+
+
+def get_model_depends(class_list) -> Dict[str, Dict[str, Dict]]:
+    # {model: {method: {'depends': [...], 'depends_context': [...]}}}
+    methods: Dict[str, Dict[str, Dict]] = {}
+    for (function, model), definitions in query.get_all_functions(class_list).items():
+        for definition in definitions.values():
+            for key in ('depends', 'depends_context'):
+                if key in definition:
+                    method = methods.setdefault(model, {}).setdefault(function, {})
+                    method.setdefault(key, [])
+                    method[key] += [d for d in definition[key] if d not in method[key]]
+    return methods
+
+
+def field_comodel(model: str, name: str, fields, seen=None) -> Optional[str]:
+    field = fields.get(model, {}).get(name)
+    if not field:
+        return None
+    if field.get('comodel_name'):
+        return field['comodel_name']
+    if field.get('related') and field['type'] in relational_field_types:
+        seen = seen or set()
+        if (model, name) in seen:
+            return None
+        seen.add((model, name))
+        nodes = resolve_path(model, field['related'], fields, seen)
+        if nodes:
+            return field_comodel(*nodes[-1], fields, seen)
+    return None
+
+
+def resolve_path(model: str, path: str, fields, seen=None) -> List[Node]:
+    # every field along a dotted path triggers the recompute
+    nodes = []
+    current: Optional[str] = model
+    for name in path.split('.'):
+        if current is None or name not in fields.get(current, {}):
+            return []
+        nodes.append((current, name))
+        current = field_comodel(current, name, fields, seen)
+    return nodes
+
+
+def field_dependencies(model, name, field, depends) -> Tuple[List[str], List[str]]:
+    if field.get('related'):
+        return [field['related']], []
+    method = depends.get(model, {}).get(field.get('compute'), {})
+    return method.get('depends', []), method.get('depends_context', [])
+
+
+def build_graph(class_list) -> Graph:
+    fields = query.get_model_fields(class_list)
+    depends = get_model_depends(class_list)
+    upstream: Dict[Node, Set[Node]] = {}
+    downstream: Dict[Node, Set[Node]] = {}
+    contexts: Dict[Node, List[str]] = {}
+    unresolved: List[Tuple[Node, str]] = []
+    by_model: Dict[str, Set[str]] = {}
+
+    for model, model_fields in fields.items():
+        for name, field in model_fields.items():
+            if not (field.get('compute') or field.get('related')):
+                continue
+            node = (model, name)
+            paths, context = field_dependencies(model, name, field, depends)
+            if context:
+                contexts[node] = context
+            for path in paths:
+                sources = resolve_path(model, path, fields)
+                if not sources:
+                    unresolved.append((node, path))
+                for source in sources:
+                    upstream.setdefault(node, set()).add(source)
+                    downstream.setdefault(source, set()).add(node)
+                    by_model.setdefault(source[0], set()).add(source[1])
+                    by_model.setdefault(model, set()).add(name)
+
+    return {
+        'upstream': upstream,
+        'downstream': downstream,
+        'contexts': contexts,
+        'unresolved': unresolved,
+        'by_model': by_model,
+    }
+
+
+def components(downstream) -> List[List[Node]]:
+    # iterative tarjan: strongly connected components, sinks first (reverse topological order)
+    index: Dict[Node, int] = {}
+    lowlink: Dict[Node, int] = {}
+    stack: List[Node] = []
+    on_stack: Set[Node] = set()
+    result = []
+    for root in downstream:
+        if root in index:
+            continue
+        work = [(root, iter(sorted(downstream.get(root, ()))))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(downstream.get(child, ())))))
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+                continue
+            work.pop()
+            if work:
+                lowlink[work[-1][0]] = min(lowlink[work[-1][0]], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                result.append(component)
+    return result
+
+
+def fan_outs(graph: Graph, limit: int = 100) -> List[Tuple[Node, int]]:
+    # reachable components per component of the condensed graph, children being done first;
+    # a set is handed over to (or dropped after) the last parent merging it
+    downstream = graph['downstream']
+    all_components = components(downstream)
+    component_of = {node: i for i, component in enumerate(all_components) for node in component}
+    children = [
+        {component_of[child] for node in component for child in downstream.get(node, ())} - {i}
+        for i, component in enumerate(all_components)
+    ]
+    parents_left = [0] * len(all_components)
+    for component_children in children:
+        for child in component_children:
+            parents_left[child] += 1
+
+    reach: Dict[int, Set[int]] = {}
+    totals: Dict[int, int] = {}  # number of fields in reach
+    counts = []
+    for i, component in enumerate(all_components):
+        done = []
+        for child in children[i]:
+            parents_left[child] -= 1
+            if not parents_left[child]:
+                done.append(child)
+        base = max(done, key=lambda c: len(reach[c]), default=None)
+        reached, total = (reach.pop(base), totals.pop(base)) if base is not None else (set(), 0)
+        for child in children[i]:
+            if child == base:
+                continue
+            for c in reach[child]:
+                if c not in reached:
+                    reached.add(c)
+                    total += len(all_components[c])
+        for child in done:
+            reach.pop(child, None)
+            totals.pop(child, None)
+        reached.add(i)
+        total += len(component)
+        if parents_left[i]:
+            reach[i], totals[i] = reached, total
+        counts += [(node, total - 1) for node in component if node in downstream]
+    counts.sort(key=lambda c: (-c[1], c[0]))
+    return counts[:limit]
+
+
+def cycles(graph: Graph) -> List[List[Node]]:
+    # strongly connected components with more than one field, or a field depending on itself
+    downstream = graph['downstream']
+    return [sorted(component) for component in components(downstream)
+            if len(component) > 1 or component[0] in downstream.get(component[0], ())]
+
+
+def model_graph(model: str, graph: Graph) -> Dict[str, Dict]:
+    # {field: {'upstream': [...], 'downstream': [...]}} for a model page
+    return {
+        name: {
+            'upstream': sorted(graph['upstream'].get((model, name), ())),
+            'downstream': sorted(graph['downstream'].get((model, name), ())),
+        }
+        for name in sorted(graph['by_model'].get(model, ()))
+    }
+
+
+def graph_report(graph: Graph) -> Dict:
+    return {
+        'fan_outs': fan_outs(graph),
+        'cycles': cycles(graph),
+        'unresolved': sorted(graph['unresolved']),
+        'contexts': graph['contexts'],
+    }
@@ -0,0 +1,173 @@
+import os
+import sys
+from collections.abc import Mapping
+from typing import Dict, List, Tuple
+
+from .utils import Path
+
+
+def intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [intern(v) for v in value]
+    return value
+
+
+class FileTable:
+    # module and file names, shared by all the classes of a file
+
+    def __init__(self):
+        self.entries: List[Tuple[str, Path, Path]] = []
+        self.ids: Dict[Tuple[str, Path], int] = {}
+
+    def add(self, module: str, file_name: Path, full_path: Path = None) -> int:
+        key = (module, file_name)
+        if key not in self.ids:
+            self.ids[key] = len(self.entries)
+            full_path = full_path or os.path.realpath(file_name)
+            self.entries.append((sys.intern(module), file_name, full_path))
+        return self.ids[key]
+
+    def module(self, file_id: int) -> str:
+        return self.entries[file_id][0]
+
+    def file(self, file_id: int) -> Path:
+        return self.entries[file_id][1]
+
+    def full_path(self, file_id: int) -> Path:
+        return self.entries[file_id][2]
+
+
+class Record(Mapping):
+    # read-only dict view over the slots that are set, so that records can be
+    # used wherever the parsed dicts were
+    __slots__ = ()
+
+    def __init__(self, values: Dict):
+        for key in self.__slots__:
+            object.__setattr__(self, key, values.get(key))
+
+    def __getitem__(self, key):
+        value = getattr(self, key) if key in self.__slots__ else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (key for key in self.__slots__ if getattr(self, key) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+
+
+class FieldRecord(Record):
+    __slots__ = (
+        'type',
+        'lineno',
+        'index',
+        'store',
+        'compute',
+        'related',
+        'required',
+        'comodel_name',
+    )
+
+    def __init__(self, values: Dict):
+        super().__init__({k: intern(v) for k, v in values.items()})
+
+
+class FunctionRecord(Record):
+    __slots__ = (
+        'lineno',
+        'args',
+        'depends',
+        'depends_context',
+    )
+
+    def __init__(self, values: Dict):
+        values = dict(values)
+        for key in ('args', 'depends', 'depends_context'):
+            if values.get(key) is not None:
+                values[key] = tuple(sys.intern(v) for v in values[key])
+        super().__init__(values)
+
+    def to_dict(self) -> Dict:
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in self.items()}
+
+
+class ClassRecord(Record):
+    __slots__ = (
+        'files',
+        'file_id',
+        'lineno',
+        '_name',
+        '_inherit',
+        '_inherits',
+        '_rec_name',
+        '_order',
+        '_description',
+        '_table',
+        '_constraints',
+        '_sql_constraints',
+        '_auto',
+        '_parent_store',
+        'fields',
+        'functions',
+    )
+    derived_keys = ('module', 'file', 'full path')
+    hidden_keys = ('files', 'file_id')
+
+    def __init__(self, files: FileTable, file_id: int, values: Dict):
+        values = dict(values, files=files, file_id=file_id)
+        for key in ('_name', '_inherit', '_rec_name', '_order', '_table'):
+            values[key] = intern(values.get(key))
+        values['fields'] = {
+            sys.intern(k): v if isinstance(v, FieldRecord) else FieldRecord(v)
+            for k, v in values.get('fields', {}).items()
+        }
+        values['functions'] = {
+            sys.intern(k): v if isinstance(v, FunctionRecord) else FunctionRecord(v)
+            for k, v in values.get('functions', {}).items()
+        }
+        super().__init__(values)
+
+    def __getitem__(self, key):
+        if key == 'module':
+            return self.files.module(self.file_id)
+        if key == 'file':
+            return self.files.file(self.file_id)
+        if key == 'full path':
+            return self.files.full_path(self.file_id)
+        if key in self.hidden_keys:
+            raise KeyError(key)
+        return super().__getitem__(key)
+
+    def __iter__(self):
+        yield from (k for k in super().__iter__() if k not in self.hidden_keys)
+        yield from self.derived_keys
+
+    def to_dict(self) -> Dict:
+        result = dict(self.items())
+        result['fields'] = {k: v.to_dict() for k, v in self.fields.items()}
+        result['functions'] = {k: v.to_dict() for k, v in self.functions.items()}
+        return result
+
+    @classmethod
+    def from_dict(cls, values: Dict, files: FileTable):
+        file_id = files.add(values['module'], values['file'])
+        values = {k: v for k, v in values.items() if k not in cls.derived_keys}
+        return cls(files, file_id, values)
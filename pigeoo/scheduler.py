@@ -0,0 +1,190 @@
+import contextvars
+import heapq
+import itertools
+import time
+from concurrent.futures import Executor
+from queue import Queue
+from threading import RLock, local
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .utils import _logger
+
+SERIAL = 'serial'  # one thread: tasks that share the build context
+PROCESS = 'process'  # worker processes: picklable functions and arguments only
+
+WAITING, READY, RUNNING, DONE, FAILED, SKIPPED = range(6)
+
+
+def timed_call(function: Callable, args: Tuple) -> Tuple[float, float, Any]:
+    # wall clock times, comparable between processes
+    start = time.time()
+    result = function(*args)
+    return start, time.time(), result
+
+
+class Task:
+    __slots__ = ('name', 'function', 'args', 'resource', 'priority', 'optional', 'dependencies',
+                 'parent', 'dependents', 'waiting', 'state', 'result', 'start', 'end')
+
+    def __init__(self, name: str, function: Callable, args: Tuple, resource: str,
+                 dependencies: List[str], priority: int, optional: bool, parent: Optional[str]):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.resource = resource
+        self.priority = priority
+        self.optional = optional
+        self.dependencies = dependencies
+        self.parent = parent  # the task that added this one
+        self.dependents: List["Task"] = []
+        self.waiting = 0
+        self.state = WAITING
+        self.result = None
+        self.start = self.end = 0.0
+
+    @property
+    def kind(self) -> str:
+        return self.name.split(':', 1)[0]
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start if self.state == DONE else 0.0
+
+
+class Scheduler:
+    # runs a task graph, every task as soon as its dependencies are done; tasks may add tasks.
+    # limits bound the tasks handed to each executor, the others wait in priority order.
+
+    def __init__(self, executors: Dict[str, Executor], limits: Dict[str, int]):
+        self.executors = executors
+        self.limits = limits
+        self.tasks: Dict[str, Task] = {}
+        self.ready: Dict[str, list] = {resource: [] for resource in executors}
+        self.running = {resource: 0 for resource in executors}
+        self.completions: Queue = Queue()
+        self.lock = RLock()
+        self.order = itertools.count()
+        self.local = local()
+        self.start = self.end = 0.0
+
+    def add(self, name: str, function: Callable, *args, dependencies=(), resource: str = SERIAL,
+            priority: int = 0, optional: bool = False) -> str:
+        with self.lock:
+            parent = getattr(self.local, 'task', None)
+            task = Task(name, function, args, resource, list(dependencies), priority, optional, parent)
+            self.tasks[name] = task
+            for dependency in (self.tasks[d] for d in task.dependencies):
+                if dependency.state in (FAILED, SKIPPED):
+                    self.skip(task, dependency.name)
+                    return name
+                if dependency.state != DONE:
+                    task.waiting += 1
+                    dependency.dependents.append(task)
+            if not task.waiting:
+                self.make_ready(task)
+        return name
+
+    def take(self, name: str) -> Any:
+        # the result, released from the task to free memory
+        task = self.tasks[name]
+        result, task.result = task.result, None
+        return result
+
+    def result(self, name: str) -> Any:
+        return self.tasks[name].result
+
+    def make_ready(self, task: Task):
+        task.state = READY
+        heapq.heappush(self.ready[task.resource], (-task.priority, next(self.order), task))
+
+    def skip(self, task: Task, cause: str):
+        if task.state in (WAITING, READY):
+            task.state = SKIPPED
+            task.function = task.args = None
+            log = _logger.info if task.optional else _logger.error
+            log(f"Skipping {task.name}: {cause} failed.")
+            for dependent in task.dependents:
+                self.skip(dependent, cause)
+
+    def dispatch(self):
+        for resource, ready in self.ready.items():
+            while ready and self.running[resource] < self.limits[resource]:
+                task = heapq.heappop(ready)[2]
+                if task.state != READY:
+                    continue
+                task.state = RUNNING
+                self.running[resource] += 1
+                executor = self.executors[resource]
+                if resource == PROCESS:
+                    future = executor.submit(timed_call, task.function, task.args)
+                else:  # keeps the context variables of the caller
+                    future = executor.submit(contextvars.copy_context().run, self.call, task)
+                future.add_done_callback(lambda f, task=task: self.completions.put((task, f)))
+
+    def call(self, task: Task):
+        self.local.task = task.name
+        return timed_call(task.function, task.args)
+
+    def complete(self, task: Task, future):
+        self.running[task.resource] -= 1
+        try:
+            task.start, task.end, task.result = future.result()
+            task.state = DONE
+        except Exception:
+            _logger.exception(f"Task {task.name}:")
+            task.state = FAILED
+        task.function = task.args = None
+        for dependent in task.dependents:
+            if task.state != DONE:
+                self.skip(dependent, task.name)
+            elif dependent.state == WAITING:
+                dependent.waiting -= 1
+                if not dependent.waiting:
+                    self.make_ready(dependent)
+        task.dependents = []
+
+    def run(self):
+        self.start = time.time()
+        while True:
+            with self.lock:
+                self.dispatch()
+                if not any(self.running.values()):
+                    break
+            task, future = self.completions.get()
+            with self.lock:
+                self.complete(task, future)
+        self.end = time.time()
+        self.log_report()
+        failed = [t.name for t in self.tasks.values()
+                  if t.state != DONE and not (t.optional and t.state in (FAILED, SKIPPED))]
+        if failed:
+            raise Exception(f"{len(failed)} tasks did not complete: {', '.join(failed[:10])}")
+
+    def critical_path(self) -> Tuple[float, List[Task]]:
+        # longest chain of dependent tasks by their durations, tasks are added after their dependencies
+        lengths: Dict[str, Tuple[float, Optional[str]]] = {}
+        for task in self.tasks.values():
+            previous = max(task.dependencies + ([task.parent] if task.parent else []),
+                           key=lambda d: lengths[d][0], default=None)
+            base = lengths[previous][0] if previous else 0.0
+            lengths[task.name] = (base + task.duration, previous)
+        if not lengths:
+            return 0.0, []
+        name: Optional[str] = max(lengths, key=lambda n: lengths[n][0])
+        length, path = lengths[name][0], []
+        while name:
+            path.append(self.tasks[name])
+            name = lengths[name][1]
+        return length, path[::-1]
+
+    def log_report(self):
+        phases: Dict[str, List[float]] = {}
+        for task in self.tasks.values():
+            phase = phases.setdefault(task.kind, [0, 0.0])
+            phase[0] += 1
+            phase[1] += task.duration
+        length, path = self.critical_path()
+        _logger.info(f"Ran {len(self.tasks)} tasks in {self.end - self.start:.2f}s, "
+                     f"critical path {length:.2f}s: {' → '.join(t.name for t in path[-6:])}")
+        for kind, (count, duration) in sorted(phases.items(), key=lambda p: -p[1][1]):
+            _logger.info(f"Phase {kind}: {count} tasks, {duration:.2f}s of work.")
@@ -0,0 +1,109 @@
+import mimetypes
+import os
+import posixpath
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+from .generator import index_class_name
+from .utils import _logger, Path
+
+DEFAULT_HOST = '127.0.0.1'  # pages show local file paths and options
+DEFAULT_PORT = 8000
+CONTENT_ENCODINGS = (('br', 'br'), ('gzip', 'gz'))  # (http name, file suffix), preferred first
+CONTENT_TYPES = {'.py': 'text/plain'}  # data files
+
+
+class DirectorySite:
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def read(self, name: str) -> Optional[bytes]:
+        file_name = os.path.join(self.path, name)
+        if not os.path.isfile(file_name):
+            return None
+        with open(file_name, 'rb') as f:
+            return f.read()
+
+
+class BundleSite:
+    # pages are read from the zip index, nothing is extracted
+
+    def __init__(self, path: Path):
+        self.bundle = zipfile.ZipFile(path)
+        self.names = set(self.bundle.namelist())
+
+    def read(self, name: str) -> Optional[bytes]:
+        return self.bundle.read(name) if name in self.names else None
+
+
+def content_type(name: str) -> str:
+    extension = os.path.splitext(name)[1]
+    result = CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return result + '; charset=utf-8' if result.startswith('text/') else result
+
+
+def accepted_encodings(header: str):
+    encodings = set()
+    for part in header.split(','):
+        encoding, _, quality = part.strip().partition(';')
+        if quality.strip().replace(' ', '') not in ('q=0', 'q=0.0'):
+            encodings.add(encoding.strip())
+    return encodings
+
+
+class Handler(BaseHTTPRequestHandler):
+    site = None
+
+    def do_GET(self):
+        self.respond(with_body=True)
+
+    def do_HEAD(self):
+        self.respond(with_body=False)
+
+    def respond(self, with_body: bool):
+        name = posixpath.normpath(unquote(urlparse(self.path).path)).lstrip('/')
+        if name in ('', '.'):
+            self.send_response(302)
+            self.send_header('Location', '/' + index_class_name())
+            self.end_headers()
+            return
+        content, encoding = None, None
+        if not name.startswith('..'):
+            accepted = accepted_encodings(self.headers.get('Accept-Encoding', ''))
+            for http_encoding, suffix in CONTENT_ENCODINGS:
+                if http_encoding in accepted:
+                    content = self.site.read(name + '.' + suffix)
+                    if content is not None:
+                        encoding = http_encoding
+                        break
+            if content is None:
+                content = self.site.read(name)
+        if content is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type(name))
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if with_body:
+            self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        _logger.info(format % args)
+
+
+def main(path: Path, port: int = DEFAULT_PORT, host: str = DEFAULT_HOST):
+    site = DirectorySite(path) if os.path.isdir(path) else BundleSite(path)
+    handler = type('SiteHandler', (Handler,), {'site': site})
+    server = ThreadingHTTPServer((host, port), handler)
+    _logger.info(f"Serving {path} on http://{host or '0.0.0.0'}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,105 @@
+import os
+import pickle
+from typing import Dict, List, Optional, Set
+
+from . import parser
+from .utils import Path, deduplicate
+
+ARTIFACT_VERSION = "1"
+GIT_OPTIONS = ('hashes', 'versions', 'git_paths', 'remotes')
+
+Artifact = Dict
+
+
+def dependency_closure(module_names: [str], paths: [Path], context) -> Set[str]:
+    # the modules and all their dependencies, from the manifests only
+    closure: Set[str] = set()
+    todo = list(module_names)
+    while todo:
+        name = todo.pop()
+        if name in closure:
+            continue
+        closure.add(name)
+        if name != 'base':
+            manifest = parser.module_manifest(name, paths, context) or {}
+            todo.extend(manifest.get('depends', ['base']))
+    return closure
+
+
+def select_modules(paths: [Path], module_names=None, shard: Optional[str] = None) -> [Path]:
+    # shard is "index/count": every count-th module by name, starting at index
+    module_paths = parser.modules_from_paths(paths)
+    if module_names is not None:
+        module_paths = [m for m in module_paths if parser.module_name_from_path(m) in module_names]
+    if shard:
+        index, count = (int(i) for i in shard.split('/'))
+        names = sorted({parser.module_name_from_path(m) for m in module_paths})
+        selected = set(names[index::count])
+        module_paths = [m for m in module_paths if parser.module_name_from_path(m) in selected]
+    return module_paths
+
+
+def module_root(module_path: Path, paths: [Path]) -> Path:
+    return next(p for p in paths if os.path.join(p, os.path.basename(module_path)) == module_path)
+
+
+def module_rank(module_path: Path, root: Path, listings: Dict[Path, List[str]]) -> int:
+    # position in the folder listing, to merge shards in the order of a single run
+    if root not in listings:
+        listings[root] = os.listdir(root)
+    return listings[root].index(os.path.basename(module_path))
+
+
+def write_artifact(artifact: Artifact, file_name: Path):
+    tmp_name = f"{file_name}.{os.getpid()}.tmp"
+    with open(tmp_name, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_name, file_name)
+    return file_name
+
+
+def load_artifact(file_name: Path) -> Artifact:
+    with open(file_name, 'rb') as f:
+        artifact = pickle.load(f)
+    if artifact.get('version') != ARTIFACT_VERSION:
+        raise Exception(f"Artifact {file_name} has version {artifact.get('version')}, "
+                        f"expected {ARTIFACT_VERSION}: run the map stage again.")
+    return artifact
+
+
+def merged_paths(artifacts: [Artifact]) -> [Path]:
+    return deduplicate(p for a in artifacts for p in a['paths'])
+
+
+def merged_options(artifacts: [Artifact], options: Dict) -> Dict:
+    # git information comes from the machines that read the repositories
+    result = dict(options, hashes={}, versions=[], git_paths=[], remotes={})
+    for artifact in artifacts:
+        git_options = artifact['options']
+        result['hashes'].update(git_options.get('hashes') or {})
+        result['remotes'].update(git_options.get('remotes') or {})
+        result['versions'] = deduplicate(result['versions'] + (git_options.get('versions') or []))
+        result['git_paths'] = deduplicate(result['git_paths'] + (git_options.get('git_paths') or []))
+    return result
+
+
+def merged_modules(artifacts: [Artifact], paths: [Path]) -> List[Dict]:
+    # modules of all shards, as listed by a single run over the paths
+    modules = [m for a in artifacts for m in a['modules']]
+    unique = {m['path']: m for m in modules}
+    return sorted(unique.values(), key=lambda m: (paths.index(m['root']), m['rank']))
+
+
+def seed_context(artifacts: [Artifact], modules: List[Dict], paths: [Path], context):
+    # the merge then never reads the addons: manifests, module paths and links come from the shards
+    module_path = context.cache('module_path')
+    manifests = context.cache('manifests')
+    for module in reversed(modules):  # the first path wins, as in parser.module_path_from_name
+        module_path.set((module['name'], tuple(paths)), module['path'])
+        manifests.set(module['path'], module['manifest'])
+    web_link = context.cache('web_link')
+    for artifact in artifacts:
+        for path, link in artifact['links'].items():
+            web_link.set(path, link)
+        for file_name, full_path in artifact['full_paths'].items():
+            context.files.add(parser.module_name_from_path(file_name), file_name, full_path)
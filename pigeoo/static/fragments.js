@@ -0,0 +1,57 @@
+// Fills the collapsed levels of module pages from fragments/<module>.js,
+// loaded with a script tag the first time one of their levels is opened.
+var pigeooFragments = {};
+
+function pigeooLink(href, text) {
+    var a = document.createElement("a");
+    a.href = href;
+    a.textContent = text;
+    return a;
+}
+
+function pigeooFill(details, data) {
+    var level = data[details.dataset.tree][Number(details.dataset.level)];
+    level.forEach(function (module) {
+        if (typeof module === "string") {
+            module = {name: module};
+        }
+        var span = document.createElement("span");
+        span.appendChild(module.path ? pigeooLink(module.path, module.name)
+                                     : document.createTextNode(module.name));
+        if (module.link) {
+            span.appendChild(pigeooLink(module.link, " 🌐"));
+        }
+        span.appendChild(pigeooLink(module.name + ".html", "🔗"));
+        var div = document.createElement("div");
+        div.className = "flowy f_c";
+        div.appendChild(span);
+        details.appendChild(div);
+    });
+    details.dataset.loaded = "1";
+}
+
+function pigeooFragment(name, data) {
+    pigeooFragments[name] = data;
+    document.querySelectorAll("details.lazy").forEach(function (details) {
+        if (details.dataset.fragment === name && details.open && !details.dataset.loaded) {
+            pigeooFill(details, data);
+        }
+    });
+}
+
+// toggle does not bubble, hence the capturing listener
+document.addEventListener("toggle", function (event) {
+    var details = event.target;
+    if (!details.classList || !details.classList.contains("lazy") || !details.open || details.dataset.loaded) {
+        return;
+    }
+    var name = details.dataset.fragment;
+    if (pigeooFragments[name]) {
+        pigeooFill(details, pigeooFragments[name]);
+    } else if (!document.getElementById("fragment-" + name)) {
+        var script = document.createElement("script");
+        script.id = "fragment-" + name;
+        script.src = "fragments/" + encodeURIComponent(name) + ".js";
+        document.head.appendChild(script);
+    }
+}, true);
@@ -0,0 +1,31 @@
+// Sorts the rows of table.sortable when a column header is clicked,
+// numerically when both cells are numbers; clicking again reverses.
+function pigeooCellValue(row, column) {
+    var text = row.cells[column].textContent.trim();
+    return text !== "" && !isNaN(text) ? Number(text) : text;
+}
+
+function pigeooSort(table, column) {
+    var rows = Array.prototype.slice.call(table.rows, 1);
+    var descending = table.dataset.column === String(column) && table.dataset.order !== "desc";
+    rows.sort(function (a, b) {
+        var x = pigeooCellValue(a, column), y = pigeooCellValue(b, column);
+        var order = typeof x === "number" && typeof y === "number" ? x - y : String(x).localeCompare(String(y));
+        return descending ? -order : order;
+    });
+    var parent = table.rows[0].parentNode;
+    rows.forEach(function (row) { parent.appendChild(row); });
+    table.dataset.column = String(column);
+    table.dataset.order = descending ? "desc" : "asc";
+}
+
+document.addEventListener("click", function (event) {
+    var header = event.target;
+    if (header.tagName !== "TH") {
+        return;
+    }
+    var table = header.closest("table");
+    if (table && table.classList.contains("sortable")) {
+        pigeooSort(table, header.cellIndex);
+    }
+});
@@ -1,12 +1,32 @@
 import logging
+import os
 
 logging.basicConfig(level=logging.INFO)
 _logger = logging.getLogger("pigeoo")
 
 Path = str
 
+PARALLEL_PARSE_THRESHOLD = 64  # files below which worker processes are not worth starting
+
 
 def file_write(content, output_name):
     with open(output_name, 'w') as output:
         output.write(content)
     return output_name
+
+
+def deduplicate(seq):
+   uniques = []
+   [uniques.append(i) for i in seq if not uniques.count(i)]
+   return uniques
+
+
+def normalize_paths(paths: [Path]) -> [Path]:
+    normalized_paths = []
+    for path in paths:
+        if os.path.split(path.rstrip("/"))[-1] == 'odoo':
+            normalized_paths.append(os.path.join(path, 'addons/'))
+            normalized_paths.append(os.path.join(path, 'odoo/addons/'))
+        else:
+            normalized_paths.append(path)
+    return [os.path.expanduser(path) for path in normalized_paths]
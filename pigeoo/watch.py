@@ -0,0 +1,264 @@
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Set
+
+from . import check
+from . import compress
+from . import generator
+from . import parser
+from . import query
+from . import recompute
+from .utils import _logger, Path
+
+DEBOUNCE_DELAY = 0.2
+POLLING_INTERVAL = 1.0
+POSITION_KEYS = ('lineno', 'file', 'full path')
+IGNORED_FOLDERS = ('static', 'i18n', 'data', 'views', 'report', 'security', 'tests')
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def watched_folders(paths: [Path]) -> Iterator[Path]:
+    # addon roots (new modules), module folders (manifests) and model folders
+    for path in paths:
+        yield path
+        for module_path in parser.modules_from_paths([path]):
+            yield module_path
+            for folder in parser.module_models_paths(module_path):
+                for base_path, dirs, _ in os.walk(folder):
+                    dirs[:] = [d for d in dirs if d not in IGNORED_FOLDERS
+                               and not re.match(parser.RE_IGNORE, d)]
+                    yield base_path
+
+
+def is_relevant(path: Path) -> bool:
+    return path.endswith('.py') or os.path.isdir(path)
+
+
+class InotifyWatcher:
+
+    def __init__(self, paths: [Path]):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders: Dict[int, Path] = {}
+        self.complete = True  # false once a new folder could not be watched
+        for folder in set(watched_folders(paths)):
+            self.add_watch(folder)
+        _logger.info(f"Watching {len(self.folders)} folders with inotify.")
+
+    def add_watch(self, folder: Path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Impossible to watch {folder}")
+        self.folders[wd] = folder
+
+    def read_events(self) -> Set[Path]:
+        changes = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if wd not in self.folders:
+                continue
+            path = os.path.join(self.folders[wd], name)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                if not re.match(parser.RE_IGNORE, name) and name not in IGNORED_FOLDERS:
+                    try:
+                        self.add_watch(path)
+                    except OSError:  # e.g. ENOSPC past fs.inotify.max_user_watches
+                        _logger.exception(f"Watching {path}:")
+                        self.complete = False
+            if is_relevant(path) or mask & IN_ISDIR:
+                changes.add(path)
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return self.read_events() if ready else set()
+
+
+class PollingWatcher:
+
+    def __init__(self, paths: [Path], interval: float = POLLING_INTERVAL):
+        self.paths = paths
+        self.interval = interval
+        self.snapshot = self.take_snapshot()
+        _logger.info(f"Polling {len(self.snapshot)} paths every {interval}s.")
+
+    def take_snapshot(self) -> Dict[Path, float]:
+        snapshot = {}
+        for folder in set(watched_folders(self.paths)):
+            snapshot[folder] = 0.0
+            for entry in os.scandir(folder):
+                if entry.is_file() and entry.name.endswith('.py'):
+                    snapshot[entry.path] = entry.stat().st_mtime
+        return snapshot
+
+    def wait(self, timeout: Optional[float]) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(deadline - time.monotonic(), 0))
+            time.sleep(delay)
+            snapshot = self.take_snapshot()
+            changes = {p for p in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(p) != self.snapshot.get(p)}
+            self.snapshot = snapshot
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+
+def make_watcher(paths: [Path]):
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError, TypeError) as e:
+        _logger.info(f"Inotify unavailable ({e}), falling back to polling.")
+        return PollingWatcher(paths)
+
+
+def debounced_changes(watcher, delay: float = DEBOUNCE_DELAY) -> Set[Path]:
+    # wait for a first change, then until things are quiet (e.g. branch switches)
+    changes = watcher.wait(None)
+    while True:
+        more = watcher.wait(delay)
+        if not more:
+            return changes
+        changes |= more
+
+
+def class_names(classes) -> Set[str]:
+    return {query.get_class_name(c) for c in classes} - {None}
+
+
+def without_positions(value):
+    if isinstance(value, dict):
+        return {k: without_positions(v) for k, v in value.items() if k not in POSITION_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [without_positions(v) for v in value]
+    return value
+
+
+def class_shapes(classes) -> List[str]:
+    # what the reports read from classes, so that moving code around does not rebuild them
+    return sorted(repr(without_positions(c.to_dict())) for c in classes)
+
+
+def remove_pages(names: Set[str], output_path: Path):
+    for name in names:
+        page = os.path.join(output_path, name + '.html')
+        for file_name in [page] + [page + '.' + e for e in compress.ENCODINGS]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+
+def update_modules(state: Dict) -> Set[str]:
+    # returns the modules whose dependencies changed
+    paths, output_path, options = state['paths'], state['output_path'], state['options']
+    context = state['context']
+    context.clear('dependencies_tree', 'dependencies_depth', 'flat_dependencies', 'manifests', 'module_path')
+    old = state['all_module_deps']
+    new = generator.generate_all_module_deps(paths, options, context)
+    modules = {m for m in new if new[m] != old.get(m)} | (old.keys() - new.keys())
+    remove_pages(old.keys() - new.keys(), output_path)
+    generator.main_generate_module_deps(new, output_path, options, modules)
+    state['all_module_deps'] = new
+    return modules
+
+
+def update(state: Dict, changes: Set[Path]):
+    start = time.monotonic()
+    paths, output_path, options = state['paths'], state['output_path'], state['options']
+    classes_by_file = state['classes_by_file']
+    modules = set()
+    if any(os.path.basename(c) == '__manifest__.py' or os.path.isdir(c) for c in changes):
+        modules = update_modules(state)
+
+    known_files = set(state['all_models_files'])
+    all_models_files = known_files
+    if modules or not changes <= known_files:  # files might have been created or deleted
+        all_modules = parser.modules_from_paths(paths, state['all_module_deps'])
+        state['all_models_files'] = parser.models_files_from_modules(all_modules)
+        all_models_files = set(state['all_models_files'])
+    changed_files = (changes & all_models_files) | (all_models_files ^ known_files)
+
+    old_classes = [c for f in changed_files for c in classes_by_file.pop(f, [])]
+    classes_by_file.update(generator.parse_models_files(
+        [f for f in changed_files if f in all_models_files], options, state['context']))
+    new_classes = [c for f in changed_files for c in classes_by_file.get(f, [])]
+    scans, old_scans = state.get('scans'), {}
+    if scans is not None:  # only the changed files are scanned again
+        old_scans = {f: scans.pop(f) for f in changed_files if f in scans}
+        scans.update(check.scan_files([f for f in changed_files if f in all_models_files], options))
+    names = class_names(old_classes) | class_names(new_classes)
+    if modules:
+        names |= class_names(c for cs in classes_by_file.values() for c in cs
+                             if c['module'] in modules)
+
+    all_model_dicts = generator.flatten_classes(state['all_models_files'], classes_by_file)
+    old_graph, graph = state['graph'], recompute.build_graph(all_model_dicts)
+    names |= {m for m in old_graph['by_model'].keys() | graph['by_model'].keys()
+              if recompute.model_graph(m, old_graph) != recompute.model_graph(m, graph)}
+    remove_pages(names - {c['_name'] for c in all_model_dicts if '_name' in c}, output_path)
+
+    reports = set()
+    if modules or class_shapes(old_classes) != class_shapes(new_classes):
+        reports |= {'audit', 'metrics', 'check'}
+    if graph != old_graph:
+        reports.add('recompute')
+    if scans is not None and any(scans.get(f) != old_scans.get(f) for f in changed_files):
+        reports.add('check')
+
+    state['graph'] = generator.main_generate_models(
+        paths, state['all_models_files'], classes_by_file, state['all_module_deps'],
+        output_path, options, state['context'], names=names, graph=graph, scans=scans, reports=reports)
+    _logger.info(f"Updated {len(names)} models, {len(modules)} modules and {len(reports)} reports "
+                 f"in {time.monotonic() - start:.2f}s.")
+
+
+def main(state: Dict):
+    watcher = make_watcher(state['paths'])
+    _logger.info("Watching for changes, interrupt to stop.")
+    try:
+        while True:
+            changes = debounced_changes(watcher)
+            if not getattr(watcher, 'complete', True):
+                _logger.info("Some folders are not watched, falling back to polling.")
+                watcher.close()
+                watcher = PollingWatcher(state['paths'])
+            try:
+                # the bundle is only written by full runs
+                with compress.compressing(state['output_path'], state['options'], bundle=False):
+                    update(state, changes)
+            except Exception:
+                _logger.exception("Updating documentation:")
+    except KeyboardInterrupt:
+        _logger.info("Writing data files.")
+        with compress.compressing(state['output_path'], state['options'], bundle=False):
+            generator.main_generate_data(generator.flatten_classes(
+                state['all_models_files'], state['classes_by_file']), state['output_path'])
@@ -17,6 +17,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     install_requires=["click>=7.1.2", "ConfigArgParse>=1.3", "lxml>=4.6.2"],
+    extras_require={"brotli": ["Brotli>=1.0"]},
     url=url_root,
     license="LGPLv3+",
     project_urls={"Bug Tracker": f"{url_root}/issues"},
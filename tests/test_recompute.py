@@ -0,0 +1,39 @@
+import random
+from collections import deque
+
+from pigeoo import recompute
+
+
+def brute_fan_out(node, downstream):
+    seen = {node}
+    queue = deque([node])
+    while queue:
+        for child in downstream.get(queue.popleft(), ()):
+            if child not in seen:
+                seen.add(child)
+                queue.append(child)
+    return len(seen) - 1
+
+
+def random_graph(seed):
+    r = random.Random(seed)
+    nodes = [('m%d' % (i % 5), 'f%d' % i) for i in range(r.randint(1, 60))]
+    downstream = {}
+    for _ in range(r.randint(0, 150)):
+        downstream.setdefault(r.choice(nodes), set()).add(r.choice(nodes))
+    return {'downstream': downstream}
+
+
+def test_fan_outs_match_breadth_first_search():
+    for seed in range(300):
+        graph = random_graph(seed)
+        expected = sorted(((node, brute_fan_out(node, graph['downstream'])) for node in graph['downstream']),
+                          key=lambda c: (-c[1], c[0]))
+        assert recompute.fan_outs(graph, limit=len(expected)) == expected, seed
+
+
+def test_fan_outs_chain_and_cycle():
+    a, b, c, d = [('m', f) for f in 'abcd']
+    graph = {'downstream': {a: {b}, b: {c}, c: {b, d}}}
+    assert recompute.fan_outs(graph) == [(a, 3), (b, 2), (c, 2)]
+    assert recompute.cycles(graph) == [[b, c]]